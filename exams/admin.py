@@ -29,7 +29,11 @@ from .forms import (
 )
 from .models import Exam, ExamFile, ExamLocation, ExamType, Section
 from .views import admin_room_poster
-from .views.admin import DoRoomSplitsFormView
+from .views.admin import (
+    DoRoomSplitsFormView,
+    RoomSplitJobStatusView,
+    RoomSplitJobView,
+)
 
 ######################################################################
 
@@ -163,17 +167,20 @@ class ExamFileAdmin(admin.ModelAdmin):
         ExamSectionM2MSemesterFilter,
     ]
     list_display = ["verbose_name", "exam_course", "exam", "exam_term", "solutions"]
+    list_select_related = ["exam"]
     raw_id_fields = ["exam"]
 
     def exam_course(self, obj):
         return obj.exam.course
 
     exam_course.short_description = "course"
+    exam_course.admin_order_field = "exam__course_label"
 
     def exam_term(self, obj):
         return obj.exam.term
 
     exam_term.short_description = "term"
+    exam_term.admin_order_field = "exam__term_label"
 
     def get_readonly_fields(self, request, obj=None):
         if obj is not None:
@@ -198,6 +205,13 @@ class ExamLocationInline(admin.TabularInline):
     formset = ExamLocationInlineFormSet
     readonly_fields = ["student_count", "occupancy_percent_display"]
 
+    def get_queryset(self, request):
+        """
+        The students at each location are counted in the same query.
+        """
+        qs = super(ExamLocationInline, self).get_queryset(request)
+        return qs.select_related("location").with_student_count()
+
 
 class ExamFileInline(admin.TabularInline):
     model = ExamFile
@@ -208,7 +222,7 @@ class ExamFileInline(admin.TabularInline):
 class ExamAdmin(admin.ModelAdmin):
     date_hierarchy = "dtstart"
     inlines = [ExamLocationInline, ExamFileInline]
-    list_display = ["course", "verbose_name", "public", "dtstart"]
+    list_display = ["course_label", "verbose_name", "term_label", "public", "dtstart"]
     list_filter = [
         "active",
         "type",
@@ -219,7 +233,7 @@ class ExamAdmin(admin.ModelAdmin):
         "modified",
     ]
     readonly_fields = ["registration_count"]
-    search_fields = ["verbose_name"]
+    search_fields = ["verbose_name", "course_label"]
     ordering = ["-dtstart"]
     save_on_top = True
     form = ExamForm  # see get_form() below
@@ -279,6 +293,17 @@ class ExamAdmin(admin.ModelAdmin):
                 name="exams_exam_split_rooms",
                 kwargs={"admin_options": self},
             ),
+            url(
+                r"^(?P<pk>[\d]+)/split-rooms/(?P<job>[\d]+)/$",
+                self.admin_site.admin_view(RoomSplitJobView.as_view()),
+                name="exams_exam_split_rooms_job",
+                kwargs={"admin_options": self},
+            ),
+            url(
+                r"^(?P<pk>[\d]+)/split-rooms/(?P<job>[\d]+)/status/$",
+                self.admin_site.admin_view(RoomSplitJobStatusView.as_view()),
+                name="exams_exam_split_rooms_job_status",
+            ),
         ] + urls
         return urls
 
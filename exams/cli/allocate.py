@@ -0,0 +1,179 @@
+"""
+Allocate rooms to every exam in a time slot, from a shared pool of classrooms.
+
+No room is given to more than one exam; each exam's rooms are then split
+by surname.  Typically:
+
+./manage.py places list --classroom > ~/classrooms.txt
+# edit this file appropriately
+./manage.py exams allocate --start "2016-12-10 09:00" --end "2016-12-10 12:00" --classrooms $(cut -f 1 ~/classrooms.txt | tr '\\n' , )
+# and when the plan looks right, add --save
+"""
+from __future__ import print_function, unicode_literals
+
+from datetime import datetime
+
+from django.forms import ValidationError
+from django.utils.timezone import get_default_timezone, is_naive, make_aware
+from places.models import ClassRoom
+
+from ..utils import room_allocation, room_splits
+from .schedule import get_queryset_list
+
+HELP_TEXT = __doc__.strip()
+DJANGO_COMMAND = "main"
+USE_ARGPARSE = True
+OPTION_LIST = (
+    (["--start"], dict(help="The start of the time slot [YYYY-MM-DD hh:mm]")),
+    (["--end"], dict(help="The end of the time slot [YYYY-MM-DD hh:mm]")),
+    (
+        ["--classrooms"],
+        dict(help="A comma delimited or whitespace delimited list of classrooms"),
+    ),
+    (
+        ["--strategy"],
+        dict(
+            default="exact",
+            help="The room split strategy; one of " + ", ".join(room_splits.STRATEGIES),
+        ),
+    ),
+    (
+        ["--divisions"],
+        dict(
+            type=int,
+            default=room_allocation.SLOT_DIVISIONS,
+            help="The number of ways of dividing the rooms between the exams to try",
+        ),
+    ),
+    (
+        ["--max-tries"],
+        dict(
+            type=int,
+            default=1000,
+            help="The maximum number of tries for each exam's room split",
+        ),
+    ),
+    (
+        ["--max-seconds"],
+        dict(
+            type=float,
+            default=None,
+            help="Stop searching after this many seconds and use the best plan found so far",
+        ),
+    ),
+    (
+        ["--min-ratio"],
+        dict(
+            type=float,
+            default=0.3,
+            help="The minimum occupancy ratio allowed for each exam",
+        ),
+    ),
+    (
+        ["--max-ratio"],
+        dict(
+            type=float,
+            default=0.5,
+            help="The maximum occupancy ratio allowed for each exam",
+        ),
+    ),
+    (
+        ["--workers"],
+        dict(
+            type=int,
+            default=1,
+            help="The number of processes used to try divisions of the rooms",
+        ),
+    ),
+    (["--seed"], dict(type=int, default=None, help="The seed for random choices")),
+    (
+        ["--save"],
+        dict(
+            action="store_true",
+            default=False,
+            help="Actually save the results (replacing the locations of every exam in the time slot)",
+        ),
+    ),
+)
+
+################################################################
+
+
+def parse_datetime(value):
+    """
+    Parse a date and time [YYYY-MM-DD hh:mm] in the default timezone.
+    """
+    value = datetime.strptime(value.strip(), "%Y-%m-%d %H:%M")
+    if is_naive(value):
+        value = make_aware(value, get_default_timezone())
+    return value
+
+
+################################################################
+
+
+def main(options, args):
+    if args:
+        print("This CLI takes no arguments")
+        return
+    if None in [options["start"], options["end"], options["classrooms"]]:
+        print("You must supply --start, --end and --classrooms")
+        return
+    if options["strategy"] not in room_splits.STRATEGIES:
+        print("Unknown strategy:", options["strategy"])
+        return
+    try:
+        dtstart = parse_datetime(options["start"])
+        dtend = parse_datetime(options["end"])
+    except ValueError as e:
+        print("Invalid date and time:", e)
+        return
+
+    classrooms = get_queryset_list(ClassRoom, options["classrooms"])
+    print("Seating Count:", sum([r.capacity or 0 for r in classrooms]))
+    for exam in room_allocation.slot_exams(dtstart, dtend):
+        print(
+            "{exam.pk}\t{exam}\t{exam.dtstart}\t{exam.registration_count}".format(
+                exam=exam
+            )
+        )
+    print()
+
+    try:
+        plan = room_allocation.do_slot_allocation(
+            dtstart,
+            dtend,
+            classrooms,
+            commit=options["save"],
+            strategy=options["strategy"],
+            min_ratio=options["min_ratio"],
+            max_ratio=options["max_ratio"],
+            max_tries=options["max_tries"],
+            max_divisions=options["divisions"],
+            workers=options["workers"],
+            seed=options["seed"],
+            max_seconds=options["max_seconds"],
+        )
+    except ValidationError as e:
+        print(" ".join(e.messages))
+        return
+
+    print(
+        "Success ratio for %s splits of classrooms: %d out of %d in %.1f seconds"
+        % (options["strategy"], plan.successes, plan.tries, plan.seconds)
+    )
+    print("Score was:", plan.score)
+    rooms = ClassRoom.objects.in_bulk(
+        [pk for exam_pk, room_pks, start_list in plan.allocations for pk in room_pks]
+    )
+    for exam_pk, room_pks, start_list in plan.allocations:
+        print("Exam", exam_pk)
+        for pk, start in zip(room_pks, start_list):
+            print(
+                "\t{room}\t{start}\t{room.capacity}".format(room=rooms[pk], start=start)
+            )
+    if options["save"]:
+        print("SAVE COMPLETE")
+
+
+################################################################
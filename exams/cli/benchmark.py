@@ -0,0 +1,137 @@
+"""
+Benchmark the room split searches on synthetic classes.
+No database access is needed; results are saved as JSON, so they
+can be compared from one version to the next.
+
+./manage.py exams benchmark --sizes 50,500,5000 --output room-splits.json
+"""
+from __future__ import print_function, unicode_literals
+
+import json
+
+from ..utils import benchmark, room_splits
+
+HELP_TEXT = __doc__.strip()
+DJANGO_COMMAND = "main"
+USE_ARGPARSE = True
+OPTION_LIST = (
+    (
+        ["--sizes"],
+        dict(
+            default=",".join(["%d" % n for n in benchmark.DEFAULT_SIZES]),
+            help="A comma delimited list of class sizes",
+        ),
+    ),
+    (
+        ["--distributions"],
+        dict(
+            default=",".join(sorted(benchmark.DISTRIBUTIONS)),
+            help="A comma delimited list of surname distributions; one or more of "
+            + ", ".join(sorted(benchmark.DISTRIBUTIONS)),
+        ),
+    ),
+    (
+        ["--strategies"],
+        dict(
+            default=",".join(room_splits.STRATEGIES),
+            help="A comma delimited list of strategies to run; one or more of "
+            + ", ".join(room_splits.STRATEGIES),
+        ),
+    ),
+    (
+        ["--max-tries"],
+        dict(type=int, default=200, help="The maximum number of tries for each search"),
+    ),
+    (
+        ["--max-seconds"],
+        dict(
+            type=float,
+            default=benchmark.DEFAULT_MAX_SECONDS,
+            help="The time limit for each search, in seconds (default: %(default)s; "
+            + "0 for none)",
+        ),
+    ),
+    (
+        ["--max-ratio"],
+        dict(type=float, default=0.5, help="The maximum occupancy ratio"),
+    ),
+    (
+        ["--workers"],
+        dict(
+            type=int,
+            default=1,
+            help="The number of processes used by each search "
+            + "(memory use is only measured for the main process)",
+        ),
+    ),
+    (["--seed"], dict(type=int, default=0, help="The seed for the synthetic classes")),
+    (
+        ["--no-memory"],
+        dict(
+            action="store_true",
+            default=False,
+            help="Do not measure memory use (each search is run twice to do this)",
+        ),
+    ),
+    (
+        ["--output"],
+        dict(help="Save the results to this file (otherwise, they are printed)"),
+    ),
+)
+
+################################################################
+
+
+def main(options, args):
+    if args:
+        print("This CLI takes no arguments")
+        return
+    sizes = [int(n) for n in options["sizes"].split(",") if n.strip()]
+    distributions = [
+        d.strip() for d in options["distributions"].split(",") if d.strip()
+    ]
+    for distribution in distributions:
+        if distribution not in benchmark.DISTRIBUTIONS:
+            print("Unknown surname distribution:", distribution)
+            return
+    strategies = [s.strip() for s in options["strategies"].split(",") if s.strip()]
+    for strategy in strategies:
+        if strategy not in room_splits.STRATEGIES:
+            print("Unknown strategy:", strategy)
+            return
+
+    results = benchmark.run_benchmarks(
+        strategies,
+        sizes=sizes,
+        distributions=distributions,
+        seed=options["seed"],
+        memory=not options["no_memory"],
+        verbose=options["output"] is not None,
+        options=dict(
+            max_tries=options["max_tries"],
+            max_seconds=options["max_seconds"] or None,
+            max_ratio=options["max_ratio"],
+            workers=options["workers"],
+        ),
+    )
+    results["options"] = dict(
+        [
+            (key, options[key])
+            for key in [
+                "strategies",
+                "max_tries",
+                "max_seconds",
+                "max_ratio",
+                "workers",
+            ]
+        ]
+    )
+
+    if options["output"] is None:
+        print(json.dumps(results, indent=2, sort_keys=True))
+    else:
+        with open(options["output"], "w") as f:
+            json.dump(results, f, indent=2, sort_keys=True)
+
+
+################################################################
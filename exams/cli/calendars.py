@@ -0,0 +1,56 @@
+"""
+Write the calendar feeds of public future exams as static .ics files.
+
+One file for every exam (all.ics), and one for each course (by slug),
+section (by id) and term, under the calendar:storage_root setting in the
+default file storage; the web server can then serve them directly.
+With the calendar:write_files setting they are written again after every
+change; otherwise, run this after changes (e.g., from cron):
+
+./manage.py exams calendars --if-changed
+"""
+from __future__ import print_function, unicode_literals
+
+from .. import conf
+from ..utils import feeds
+
+HELP_TEXT = __doc__.strip()
+DJANGO_COMMAND = "main"
+USE_ARGPARSE = True
+OPTION_LIST = (
+    (
+        ["--root"],
+        dict(
+            default=None,
+            help="Where to write the files in the storage (default: the "
+            + "calendar:storage_root setting)",
+        ),
+    ),
+    (
+        ["--if-changed"],
+        dict(
+            action="store_true",
+            default=False,
+            help="Only write the files if an exam or location has changed "
+            + "since they were last written",
+        ),
+    ),
+)
+
+################################################################
+
+
+def main(options, args):
+    if args:
+        print("This CLI takes no arguments")
+        return
+
+    root = options["root"] or conf.get("calendar:storage_root")
+    written = feeds.write_calendar_files(root=root, if_changed=options["if_changed"])
+    if not written:
+        print("The calendar files are up to date.")
+        return
+    print("%d calendar file(s) written to %s" % (len(written), root))
+
+
+################################################################
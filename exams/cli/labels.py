@@ -0,0 +1,58 @@
+"""
+Backfill and verify the stored course and term labels of exams.
+
+The labels are normally kept up to date when an exam's sections change;
+use this after adding the labels, or to check them:
+
+./manage.py exams labels --verify
+./manage.py exams labels
+"""
+from __future__ import print_function, unicode_literals
+
+import sys
+
+from ..models import Exam
+
+HELP_TEXT = __doc__.strip()
+DJANGO_COMMAND = "main"
+USE_ARGPARSE = True
+OPTION_LIST = (
+    (
+        ["--verify"],
+        dict(
+            action="store_true",
+            default=False,
+            help="Only report the exams whose labels are out of date",
+        ),
+    ),
+)
+
+################################################################
+
+
+def main(options, args):
+    if args:
+        print("This CLI takes no arguments")
+        return
+
+    stale = 0
+    qs = Exam.objects.all().prefetch_related("sections__course", "sections__term")
+    for exam in qs:
+        old = (exam.course_label, exam.term_label)
+        if not exam.update_labels(commit=not options["verify"]):
+            continue
+        stale += 1
+        print(
+            "{exam.pk}\t{exam}\t{old[0]!r} -> {exam.course_label!r}\t{old[1]!r} -> {exam.term_label!r}".format(
+                exam=exam, old=old
+            )
+        )
+    if options["verify"]:
+        print("%d exam(s) with labels out of date" % stale)
+        if stale:
+            sys.exit(1)
+    else:
+        print("%d exam(s) updated" % stale)
+
+
+################################################################
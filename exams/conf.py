@@ -29,9 +29,64 @@ DEFAULT = {
     # Exams and ExamLocations do a few expensive things with
     # classlists queries.  Django's cache framework API is used
     # to deal with these.  Classlists are not expected to change
-    # frequenty by the time exams are set
+    # frequenty by the time exams are set.  The cached values for an
+    # exam are versioned, and are out of date as soon as its sections
+    # or locations change, so long timeouts are safe.
     "cache_enabled": False,
     "cache_timeout": 7200,
+    # Also make an exam's cached values out of date when a student
+    # registration for one of its sections is saved or deleted (this
+    # takes a query for each registration saved, with cache_enabled).
+    "cache_registration_signals": True,
+    # The number of processes used to search for room splits.
+    # The result is the same for any number of workers.
+    "room_splits:workers": 1,
+    # The initial time limit (in seconds) for room splits done in the
+    # admin; the best split found by then is used.
+    "room_splits:max_seconds": 10.0,
+    # Admin room splits are done by a thread pool in the web process
+    # (with this many threads), and the admin page waits for the result.
+    # The seating index and calendar files are built by the same pool, so
+    # with one thread all of these are done one after another.
+    # Set 'room_splits:background' to False to split rooms during the request.
+    "room_splits:background": True,
+    "room_splits:background_threads": 1,
+    # A background room split which has not finished this many seconds
+    # (past its time limit) after it was last updated is taken to be lost,
+    # e.g., when the web process restarted, and is marked as failed.
+    "room_splits:lost_job_seconds": 3600,
+    # Use NumPy (when it is installed) to score many orders of rooms
+    # at once in the shuffle search.
+    "room_splits:numpy": True,
+    # The best room split found for an exam's students and rooms is
+    # cached for this long (in seconds), and used again for the same
+    # students, rooms and options.  Set to 0 to always search.
+    "room_splits:cache_timeout": 604800,
+    # Calendar feeds are cached for this long (in seconds); they are
+    # cached again as soon as an exam or location changes, so this can
+    # be long.  Set to 0 to not cache them.
+    "calendar:cache_timeout": 86400,
+    # Where ``./manage.py exams calendars`` writes the static calendar
+    # files, in the default file storage.  Set 'calendar:write_files' to
+    # True to also write them in the background after every change to an
+    # exam or location.
+    "calendar:storage_root": "exams/calendars",
+    "calendar:write_files": False,
+    # Calendar events are identified by the exam, at this domain.
+    "calendar:uid_domain": "exams.localhost",
+    # The "where do I write?" lookup covers public exams in the next
+    # this many days.  Its index is cached for this long (in seconds),
+    # and is built again in the background after an exam, its sections,
+    # its locations or a student registration change.  Set to 0 to look
+    # students up in the database every time.
+    "seating:days": 14,
+    "seating:cache_timeout": 86400,
+    # Signed in students look up their own exams by this field of their
+    # registrations (e.g., "student__person__username"), if set; those
+    # who can change exams can look up anyone, by student number.
+    "seating:login_field": None,
+    # What student numbers and logins look like.
+    "seating:student_pattern": r"^[A-Za-z0-9_.@+-]{1,64}$",
     # by default, staff (not superusers) only see exams in the future
     # set this to False to change.
     "staff_sees_only_future": True,
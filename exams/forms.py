@@ -16,7 +16,7 @@ from django.utils.text import slugify
 from django.utils.timezone import now
 
 from . import conf
-from .models import Exam, ExamFile, ExamLocation
+from .models import Exam, ExamFile, ExamLocation, RoomSplitJob
 
 #######################################################################
 #######################################################################
@@ -176,6 +176,16 @@ class ExamLocationBaseInlineFormSet(forms.models.BaseInlineFormSet):
     provide a custom clean method.
     """
 
+    def _construct_form(self, i, **kwargs):
+        """
+        Every location shares the exam, so the students at each of them
+        (see ``Exam.location_rosters()``) are found together.
+        """
+        form = super(ExamLocationBaseInlineFormSet, self)._construct_form(i, **kwargs)
+        if self.instance.pk is not None:
+            form.instance.exam = self.instance
+        return form
+
     # def clean(self):
     #     """
     #     Custom clean method to validate that the entire sequence
@@ -288,6 +298,27 @@ class DoRoomSplitForm(forms.Form):
         label="Computation time",
         help_text="Higher numbers give better results, but take longer to run. Minimum 50, maximum 10000.",
     )
+    max_seconds = forms.FloatField(
+        required=False,
+        min_value=0.1,
+        label="Time limit",
+        help_text="Seconds; the best split found in this time is used. Leave blank for no time limit.",
+    )
+    strategy = forms.ChoiceField(
+        choices=(),
+        help_text="The exact method always finds the best split for each order of rooms it tries.  The incremental method adjusts the current split, moving as few students as possible.",
+    )
+    recompute = forms.BooleanField(
+        required=False,
+        label="Search again",
+        help_text="Otherwise, a split found earlier for the same students, rooms and options is used.  The earlier split is kept unless a better one is found.",
+    )
+
+    def __init__(self, *args, **kwargs):
+        from .utils.room_splits import strategy_choices
+
+        super(DoRoomSplitForm, self).__init__(*args, **kwargs)
+        self.fields["strategy"].choices = strategy_choices()
 
     def clean_exam(self):
         exam = self.cleaned_data.get("exam", None)
@@ -302,6 +333,10 @@ class DoRoomSplitForm(forms.Form):
         max_tries = self.cleaned_data.get("max_tries")
         min_ratio = self.cleaned_data.get("min_ratio")
         max_ratio = self.cleaned_data.get("max_ratio")
+        strategy = self.cleaned_data.get("strategy")
+        max_seconds = self.cleaned_data.get("max_seconds")
+        recompute = self.cleaned_data.get("recompute")
+        self.stats = {}
         return utils_room_splits(
             exam,
             check_only=check_only,
@@ -309,6 +344,11 @@ class DoRoomSplitForm(forms.Form):
             max_tries=max_tries,
             min_ratio=min_ratio,
             max_ratio=max_ratio,
+            strategy=strategy,
+            workers=conf.get("room_splits:workers"),
+            max_seconds=max_seconds,
+            stats=self.stats,
+            recompute=recompute,
         )
 
     def clean(self, *args, **kwargs):
@@ -322,5 +362,20 @@ class DoRoomSplitForm(forms.Form):
         """
         return self.do_room_splits(commit=commit, check_only=False)
 
+    def create_job(self):
+        """
+        Record a room split to be done in the background
+        (see ``exams.utils.background``).
+        """
+        return RoomSplitJob.objects.create(
+            exam=self.cleaned_data.get("exam"),
+            min_ratio=self.cleaned_data.get("min_ratio"),
+            max_ratio=self.cleaned_data.get("max_ratio"),
+            max_tries=self.cleaned_data.get("max_tries"),
+            max_seconds=self.cleaned_data.get("max_seconds"),
+            strategy=self.cleaned_data.get("strategy"),
+            recompute=self.cleaned_data.get("recompute"),
+        )
+
 
 #######################################################################
@@ -5,7 +5,7 @@ from __future__ import print_function, unicode_literals
 
 from django.db import models
 
-from .querysets import ExamFileQuerySet, ExamQuerySet
+from .querysets import ExamFileQuerySet, ExamLocationQuerySet, ExamQuerySet
 
 ################################################################
 
@@ -32,14 +32,18 @@ ExamManager = ExamManager.from_queryset(ExamQuerySet)
 
 class ExamLocationManager(models.Manager):
     """
-    Default manager for exam locations.
+    Default manager for exam locations, just a wrapper for returning
+    the custom _QuerySet
     """
 
-    def active(self):
+    def get_queryset(self):
         """
-        Filter out non-active objects
+        Return the custom QuerySet
         """
-        return self.filter(active=True)
+        return ExamLocationQuerySet(self.model)
+
+
+ExamLocationManager = ExamLocationManager.from_queryset(ExamLocationQuerySet)
 
 
 ################################################################
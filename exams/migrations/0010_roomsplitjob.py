@@ -0,0 +1,67 @@
+# Generated by Django 2.2.1 on 2026-10-17 10:12
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [("exams", "0009_auto_20190508_1147")]
+
+    operations = [
+        migrations.CreateModel(
+            name="RoomSplitJob",
+            fields=[
+                (
+                    "id",
+                    models.AutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "created",
+                    models.DateTimeField(
+                        auto_now_add=True, verbose_name="creation time"
+                    ),
+                ),
+                (
+                    "modified",
+                    models.DateTimeField(
+                        auto_now=True, verbose_name="last modification time"
+                    ),
+                ),
+                (
+                    "status",
+                    models.CharField(
+                        choices=[
+                            ("pending", "Pending"),
+                            ("running", "Running"),
+                            ("done", "Done"),
+                            ("failed", "Failed"),
+                        ],
+                        default="pending",
+                        max_length=8,
+                    ),
+                ),
+                ("min_ratio", models.FloatField()),
+                ("max_ratio", models.FloatField()),
+                ("max_tries", models.PositiveIntegerField()),
+                ("max_seconds", models.FloatField(blank=True, null=True)),
+                ("strategy", models.CharField(max_length=16)),
+                ("score", models.PositiveIntegerField(blank=True, null=True)),
+                ("tries", models.PositiveIntegerField(default=0)),
+                ("successes", models.PositiveIntegerField(default=0)),
+                ("seconds", models.FloatField(blank=True, null=True)),
+                ("message", models.TextField(blank=True)),
+                (
+                    "exam",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE, to="exams.Exam"
+                    ),
+                ),
+            ],
+            options={"ordering": ["-created"]},
+        )
+    ]
@@ -0,0 +1,15 @@
+# Generated by Django 2.2.1 on 2026-10-17 11:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [("exams", "0010_roomsplitjob")]
+
+    operations = [
+        migrations.AddField(
+            model_name="roomsplitjob",
+            name="recompute",
+            field=models.BooleanField(default=False),
+        )
+    ]
@@ -0,0 +1,55 @@
+# Generated by Django 2.2.1 on 2026-10-17 15:05
+
+from django.db import migrations, models
+
+
+def backfill_labels(apps, schema_editor):
+    """
+    Fill in the labels of the existing exams, as ``Exam.update_labels()``
+    does; the course and term names come from their own models.
+    """
+    from classes.models import Course, Semester
+
+    Exam = apps.get_model("exams", "Exam")
+    course_length = Exam._meta.get_field("course_label").max_length
+    term_length = Exam._meta.get_field("term_label").max_length
+    for exam in Exam.objects.all():
+        sections = exam.sections.all()
+        courses = Course.objects.filter(
+            pk__in=sections.values_list("course", flat=True)
+        )
+        terms = Semester.objects.filter(pk__in=sections.values_list("term", flat=True))
+        Exam.objects.filter(pk=exam.pk).update(
+            course_label="/".join([c.label for c in courses])[:course_length],
+            term_label="/".join([str(t) for t in terms])[:term_length],
+        )
+
+
+class Migration(migrations.Migration):
+    dependencies = [("exams", "0011_roomsplitjob_recompute")]
+
+    operations = [
+        migrations.AddField(
+            model_name="exam",
+            name="course_label",
+            field=models.CharField(
+                blank=True,
+                db_index=True,
+                editable=False,
+                max_length=128,
+                verbose_name="course",
+            ),
+        ),
+        migrations.AddField(
+            model_name="exam",
+            name="term_label",
+            field=models.CharField(
+                blank=True,
+                db_index=True,
+                editable=False,
+                max_length=64,
+                verbose_name="term",
+            ),
+        ),
+        migrations.RunPython(backfill_labels, migrations.RunPython.noop),
+    ]
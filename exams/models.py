@@ -16,6 +16,8 @@ Additionally there are ExamFiles (fk to Exam).
 from __future__ import division, print_function, unicode_literals
 
 import datetime
+from bisect import bisect_left
+from collections import OrderedDict, namedtuple
 from random import random
 
 import vobject
@@ -26,14 +28,20 @@ from django.db import models
 from django.db.utils import IntegrityError
 from django.urls import reverse
 from django.utils.encoding import python_2_unicode_compatible
-from django.utils.timezone import now
+from django.utils.timezone import now, utc
 from places.models import ClassRoom
 from students.models import Student_Registration
 
 from . import conf
 from .managers import ExamFileManager, ExamLocationManager, ExamManager
-from .signals import exam_m2m_changed_handler
+from .signals import (
+    exam_changed_handler,
+    exam_m2m_changed_handler,
+    examlocation_changed_handler,
+    registration_changed_handler,
+)
 from .utils import slug_autonumber
+from .utils.exam_cache import exam_cache_key, location_cache_key
 from .validators import validate_reasonable_time
 
 ################################################################
@@ -43,6 +51,127 @@ ADMIN_CONTACT = conf.get("admin_contact")
 USE_CACHE = conf.get("cache_enabled")
 CACHE_TIMEOUT = conf.get("cache_timeout")
 
+# An active exam location, and the letters its students' surnames go
+# from (start) and up to (upto, exclusive) or through (finish).
+LocationBoundary = namedtuple(
+    "LocationBoundary", ["pk", "start_letter", "upto_letter", "finish_letter"]
+)
+
+# A student registration, with just what the exam rosters need; this is
+# what is cached, rather than the registrations themselves.
+# ``name`` is how the student is shown, ``"{}".format(student)``.
+RosterEntry = namedtuple(
+    "RosterEntry",
+    ["pk", "student_number", "sn", "given_name", "section_name", "name"],
+)
+
+################################################################
+
+
+def _finish_letter(start, upto):
+    """
+    The last letters before ``upto``, for a location starting at
+    ``start``; see ``ExamLocation.finish_letter``.
+    """
+
+    def _to_number(s):
+        """convert the string s to a number n"""
+        if s == "|":
+            return 26 * 26
+        s = s.lower()
+        n = 25
+        for c in s:
+            n *= 26
+            n += ord(c) - ord("a")
+        return n
+
+    def _to_string(n):
+        """convert the number n to a string s"""
+        s = ""
+        while True:
+            k = n % 26
+            s = chr(k + ord("a")) + s
+            n //= 26
+            if n == 25:
+                return s
+
+    upto = upto.lower()
+    if not upto:
+        return ""
+    start = start.lower()
+    if not (start < upto):
+        return ""
+    n = _to_number(upto)
+    s = _to_string(n - 1)
+    if start[: len(s)] == s:
+        s += "z"
+    return s
+
+
+def build_location_boundaries(rows):
+    """
+    The ``LocationBoundary`` list for the (pk, start_letter) rows of an
+    exam's active locations, in order; see ``Exam.location_boundaries``.
+    """
+    result = []
+    for i, (pk, start) in enumerate(rows):
+        if not start or not start.isalpha():
+            upto = ""
+        elif i == len(rows) - 1:  # the last one
+            upto = "|"
+        else:
+            upto = rows[i + 1][1]
+        result.append(LocationBoundary(pk, start, upto, _finish_letter(start, upto)))
+    return result
+
+
+################################################################
+
+
+def location_intervals(boundaries):
+    """
+    The lower case surnames at each location, as a list of
+    (pk, start, finish): from start up to (but not including) finish.
+    A location with no start letter has everyone when it is the only
+    one, and no one otherwise.
+    """
+    result = []
+    for boundary in boundaries:
+        if boundary.start_letter:
+            start = boundary.start_letter.lower()
+        elif len(boundaries) == 1:
+            start = "a"
+        else:
+            result.append((boundary.pk, "", ""))  # no one.
+            continue
+        finish = boundary.upto_letter.lower() or "|"
+        result.append((boundary.pk, start, finish))
+    return result
+
+
+################################################################
+
+
+def _distinct(object_list):
+    """
+    The objects in the list, without repeats, in order.
+    """
+    seen = set()
+    result = []
+    for obj in object_list:
+        if obj.pk not in seen:
+            seen.add(obj.pk)
+            result.append(obj)
+    return result
+
+
+def _label_length(name):
+    """
+    The longest stored course or term label; see ``Exam.update_labels()``.
+    """
+    return Exam._meta.get_field(name).max_length
+
+
 ################################################################
 
 
@@ -129,6 +258,13 @@ class Exam(models.Model):
         blank=True,
         help_text="Set this to override the number of students writing (for sign-in sheets)",
     )
+    # kept up to date by exam_m2m_changed_handler; see update_labels().
+    course_label = models.CharField(
+        max_length=128, blank=True, editable=False, db_index=True, verbose_name="course"
+    )
+    term_label = models.CharField(
+        max_length=64, blank=True, editable=False, db_index=True, verbose_name="term"
+    )
 
     objects = ExamManager()
 
@@ -171,12 +307,18 @@ class Exam(models.Model):
         """
         cal = vobject.iCalendar()
         ev = cal.add("vevent")
-        ev.add("dtstamp").value = self.dtstart
-        ev.add("dtstart").value = self.dtstart
-        ev.add("dtend").value = self.dtend
+        # in UTC, so the event can be serialized on its own (see
+        # exams.utils.feeds), and the same uid every time.
+        dtstart = self.dtstart.astimezone(utc)
+        ev.add("uid").value = "exam-{}@{}".format(
+            self.pk, conf.get("calendar:uid_domain")
+        )
+        ev.add("dtstamp").value = dtstart
+        ev.add("dtstart").value = dtstart
+        ev.add("dtend").value = dtstart + datetime.timedelta(minutes=self.duration)
         ev.add("summary").value = self.course + " " + self.verbose_name
         ev.add("location").value = ", ".join(
-            ["{}".format(loc) for loc in self.examlocation_set.active()]
+            ["{}".format(loc) for loc in self.active_locations]
         )
         if not self.public:
             ev.add("description").value = "This exam is *not* being advertised."
@@ -198,20 +340,45 @@ class Exam(models.Model):
     @property
     def registration_list(self):
         """
-        Return a list of student registrations who are known to be
-        writing this exam.
+        Return a queryset of student registrations who are known to be
+        writing this exam.  See ``roster`` for a cached list of them.
+        """
+        section_keys = self.sections.values_list("pk", flat=True)
+        return Student_Registration.objects.reg_list(
+            section__in=section_keys, good_standing=True, aurora_verified=True
+        ).select_related("student__person", "section")
+
+    @property
+    def roster(self):
+        """
+        Return a list of ``RosterEntry`` for the students known to be
+        writing this exam, sorted by surname.  This is what the print
+        templates use; it is kept on the exam and in the cache, so it
+        takes no queries once it has been built.
         """
-        cache_key = "exams.%s:%r:registration_list" % (self.__class__.__name__, self.pk)
+        result = getattr(self, "_roster", None)
+        if result is not None:
+            return result
+        cache_key = exam_cache_key(self.pk, "roster") if USE_CACHE else None
 
         result = cache.get(cache_key) if USE_CACHE else None
         if result is None:
-            section_keys = self.sections.values_list("pk", flat=True)
-            result = Student_Registration.objects.reg_list(
-                section__in=section_keys, good_standing=True, aurora_verified=True
-            ).select_related()
+            result = [
+                RosterEntry(
+                    reg.pk,
+                    reg.student.student_number,
+                    reg.student.person.sn,
+                    reg.student.person.given_name,
+                    reg.section.section_name,
+                    "{}".format(reg.student),
+                )
+                for reg in self.registration_list
+            ]
+            result.sort(key=lambda entry: entry.sn.lower())
             if USE_CACHE:
                 cache.set(cache_key, result, CACHE_TIMEOUT)
 
+        self._roster = result
         return result
 
     def student_count_range(self):
@@ -236,22 +403,106 @@ class Exam(models.Model):
         """
         if not self.active:
             return None
-        cache_key = "exams.%s:%r:registration_surnames" % (
-            self.__class__.__name__,
-            self.pk,
+        cache_key = (
+            exam_cache_key(self.pk, "registration_surnames") if USE_CACHE else None
         )
 
         result = cache.get(cache_key) if USE_CACHE else None
         if result is None:
-            result = [r.student.person.sn.lower() for r in self.registration_list]
-            # there is an optimization here, since the DB I'm using
-            # returns this as a case insensitve ordering of the surnames
+            result = [entry.sn.lower() for entry in self.roster]
+            # the roster is sorted case insensitively already.
             result.sort()  # do it anyhow.
             if USE_CACHE:
                 cache.set(cache_key, result, CACHE_TIMEOUT)
 
         return result
 
+    @property
+    def location_boundaries(self):
+        """
+        Return a list of ``LocationBoundary`` for the active exam
+        locations, in order.  This takes one query, and is kept on the
+        exam and in the cache (until a location changes).
+        """
+        result = getattr(self, "_location_boundaries", None)
+        if result is not None:
+            return result
+        cache_key = (
+            exam_cache_key(self.pk, "location_boundaries") if USE_CACHE else None
+        )
+
+        result = cache.get(cache_key) if USE_CACHE else None
+        if result is None:
+            rows = list(
+                ExamLocation.objects.filter(active=True, exam=self).values_list(
+                    "pk", "start_letter"
+                )
+            )
+            result = build_location_boundaries(rows)
+            if USE_CACHE:
+                cache.set(cache_key, result, CACHE_TIMEOUT)
+
+        self._location_boundaries = result
+        return result
+
+    @property
+    def active_locations(self):
+        """
+        Return a list of the active exam locations, in order, with their
+        classrooms.  Each of them shares this exam (and its rosters).
+        """
+        result = getattr(self, "_active_locations", None)
+        if result is None:
+            result = list(self.examlocation_set.active().select_related("location"))
+            self._active_locations = result
+        return result
+
+    def location_rosters(self):
+        """
+        Return an OrderedDict of the ``roster`` entries at each active
+        exam location, by location pk; the counts are their lengths.
+        The roster is sorted already, and each location's students are
+        found by bisecting it at the location's letters.
+        """
+        result = getattr(self, "_location_rosters", None)
+        if result is not None:
+            return result
+        reg_list = self.roster
+        surnames = [entry.sn.lower() for entry in reg_list]
+        result = OrderedDict()
+        for pk, start, finish in location_intervals(self.location_boundaries):
+            result[pk] = reg_list[
+                bisect_left(surnames, start) : bisect_left(surnames, finish)
+            ]
+        if USE_CACHE:
+            cache.set_many(
+                dict(
+                    (location_cache_key(self.pk, pk, "roster"), regs)
+                    for pk, regs in result.items()
+                ),
+                CACHE_TIMEOUT,
+            )
+
+        self._location_rosters = result
+        return result
+
+    def _stored_label(self, name):
+        """
+        The stored label, unless it was cut short (or is blank), in which
+        case None; see ``update_labels()``.
+        """
+        label = getattr(self, name)
+        if len(label) < _label_length(name):
+            return label
+        return None
+
+    def _prefetched_sections(self):
+        """
+        The sections, if they were prefetched (see
+        ``ExamQuerySet.for_listing()``), or else None.
+        """
+        return getattr(self, "_prefetched_objects_cache", {}).get("sections")
+
     @property
     def course_list(self):
         """
@@ -260,6 +511,9 @@ class Exam(models.Model):
         an exam to only one course, there are several cross numbered
         courses that would break on this, e.g. 4000/7000 level courses.
         """
+        sections = self._prefetched_sections()
+        if sections is not None:
+            return _distinct([s.course for s in sections])
         course_keys = self.sections.values_list("course", flat=True)
         return Course.objects.filter(pk__in=course_keys)
 
@@ -268,6 +522,15 @@ class Exam(models.Model):
         """
         Returns a string for the courses this corresponds to.
         """
+        label = self._stored_label("course_label")
+        if label:
+            return label
+        return self.get_course_label()
+
+    def get_course_label(self):
+        """
+        Build the string for the courses from the sections.
+        """
         return "/".join([c.label for c in self.course_list])
 
     @property
@@ -275,6 +538,9 @@ class Exam(models.Model):
         """
         return a queryset of terms this exam is for.
         """
+        sections = self._prefetched_sections()
+        if sections is not None:
+            return _distinct([s.term for s in sections])
         keys = self.sections.values_list("term", flat=True)
         return Semester.objects.filter(pk__in=keys)
 
@@ -283,8 +549,35 @@ class Exam(models.Model):
         """
         Returns a string for the term this corresponds to.
         """
+        label = self._stored_label("term_label")
+        if label:
+            return label
+        return self.get_term_label()
+
+    def get_term_label(self):
+        """
+        Build the string for the terms from the sections.
+        """
         return "/".join([str(t) for t in self.term_list])
 
+    def update_labels(self, commit=True):
+        """
+        Recompute ``course_label`` and ``term_label`` from the sections,
+        cut to the length of the fields.  With ``commit``, they are saved
+        (without the rest of the exam).  Returns True if either one changed.
+        """
+        course_label = self.get_course_label()[: _label_length("course_label")]
+        term_label = self.get_term_label()[: _label_length("term_label")]
+        changed = (course_label, term_label) != (self.course_label, self.term_label)
+        self.course_label = course_label
+        self.term_label = term_label
+        if changed and commit and self.pk is not None:
+            # modified as well, for the calendar feeds.
+            Exam.objects.filter(pk=self.pk).update(
+                course_label=course_label, term_label=term_label, modified=now()
+            )
+        return changed
+
     def reset_slug(self):
         self.slug = "-save-fix-{0}".format(id(self))
         exam_m2m_changed_handler(
@@ -302,6 +595,8 @@ class Exam(models.Model):
 models.signals.m2m_changed.connect(
     exam_m2m_changed_handler, sender=Exam.sections.through
 )
+models.signals.post_save.connect(exam_changed_handler, sender=Exam)
+models.signals.post_delete.connect(exam_changed_handler, sender=Exam)
 
 ################################################################
 
@@ -351,43 +646,37 @@ class ExamLocation(models.Model):
         return None
 
     @property
-    def registration_list(self):
+    def roster(self):
         """
-        Return a sorted list of registrations at this location.
+        Return a sorted list of the ``RosterEntry`` at this location.
         NOTE: this is a sorted list so that classlists and similar
         are ordered correctly.
         """
         if not self.active:
             return None
-        cache_key = "exams.%s:%r:registration_list" % (self.__class__.__name__, self.pk)
+        cache_key = (
+            location_cache_key(self.exam_id, self.pk, "roster") if USE_CACHE else None
+        )
 
         result = cache.get(cache_key) if USE_CACHE else None
         if result is None:
-            if self.start_letter:
-                start = self.start_letter.lower()
-            else:
-                qs = ExamLocation.objects.filter(active=True, exam=self.exam)
-                n = qs.count()
-                if n == 1:
-                    start = "a"
-                else:
-                    return []
-            finish = self.upto_letter.lower()
-            if not finish:
-                finish = "|"
-            # This happens when this is the only location.
-            reg_list = self.exam.registration_list
-            result = [
-                reg
-                for reg in reg_list
-                if start <= reg.student.person.sn.lower() < finish
-            ]
-            result.sort(key=lambda reg: reg.student.person.sn.lower())
-            if USE_CACHE:
-                cache.set(cache_key, result, CACHE_TIMEOUT)
+            # every location's list is found (and cached) at once.
+            result = self.exam.location_rosters().get(self.pk, [])
 
         return result
 
+    @property
+    def registration_list(self):
+        """
+        Return a sorted list of the student registrations at this
+        location.  See ``roster`` for a cached list of them.
+        """
+        roster = self.roster
+        if roster is None:
+            return None
+        regs = self.exam.registration_list.in_bulk([entry.pk for entry in roster])
+        return [regs[entry.pk] for entry in roster if entry.pk in regs]
+
     @property
     def registration_surnames(self):
         """
@@ -397,9 +686,10 @@ class ExamLocation(models.Model):
         """
         if not self.active:
             return None
-        cache_key = "exams.%s:%r:registration_surnames" % (
-            self.__class__.__name__,
-            self.pk,
+        cache_key = (
+            location_cache_key(self.exam_id, self.pk, "registration_surnames")
+            if USE_CACHE
+            else None
         )
 
         result = cache.get(cache_key) if USE_CACHE else None
@@ -407,13 +697,24 @@ class ExamLocation(models.Model):
             start = self.start_letter.lower()
             finish = self.upto_letter.lower()
             reg_list = self.exam.registration_surnames
-            result = [reg for reg in reg_list if start <= reg < finish]
-            # result.sort(key=lambda reg: reg.student.person.sn.lower())
+            result = reg_list[
+                bisect_left(reg_list, start) : bisect_left(reg_list, finish)
+            ]
             if USE_CACHE:
                 cache.set(cache_key, result, CACHE_TIMEOUT)
 
         return result
 
+    def _boundary(self):
+        """
+        This location's entry in ``Exam.location_boundaries``.
+        """
+        for boundary in self.exam.location_boundaries:
+            if boundary.pk == self.pk:
+                return boundary
+        # should never reach this, so raise an AssertionError:
+        assert False, "there was a serious problem finding the next exam location"
+
     @property
     def upto_letter(self):
         """
@@ -425,75 +726,37 @@ class ExamLocation(models.Model):
             return ""
         if not self.start_letter.isalpha():
             return ""
-        qs = ExamLocation.objects.filter(active=True, exam=self.exam)
-        n = qs.count()
-        if n == 0:  # no active locations
-            return "|"
-
-        if qs[n - 1] == self:  # i'm the last one
-            return "|"
-
-        for i in range(n):
-            if qs[i] == self:
-                next_loc = qs[i + 1]
-                return next_loc.start_letter
-
-        # return '~'
-        # should never reach this, so raise an AssertionError:
-        assert False, "there was a serious problem finding the next exam location"
+        return self._boundary().upto_letter
 
     @property
     def finish_letter(self):
         """
-        This is sort of like upto letter... and might be expensive.
+        This is sort of like upto letter, but inclusive.
         """
         if not self.active:
             return None
-
-        def _to_number(s):
-            """convert the string s to a number n"""
-            if s == "|":
-                return 26 * 26
-            s = s.lower()
-            n = 25
-            for c in s:
-                n *= 26
-                n += ord(c) - ord("a")
-            return n
-
-        def _to_string(n):
-            """convert the number n to a string s"""
-            s = ""
-            while True:
-                k = n % 26
-                s = chr(k + ord("a")) + s
-                n //= 26
-                if n == 25:
-                    return s
-
-        upto = self.upto_letter.lower()
-        if not upto:
-            return ""
-        start = self.start_letter.lower()
-        if not (start < upto):
+        if not self.start_letter:
             return ""
-        n = _to_number(upto)
-        s = _to_string(n - 1)
-        if start[: len(s)] == s:
-            s += "z"
-        return s
+        return self._boundary().finish_letter
 
     @property
     def student_count(self):
+        """
+        Counted by the database, when the location came from
+        ``ExamLocation.objects.with_student_count()``.
+        """
         if self.active:
-            return len(self.registration_list)
+            count = getattr(self, "db_student_count", None)
+            if count is not None:
+                return count
+            return len(self.roster)
 
     @property
     def occupancy_percent(self):
         if not self.active:
             return None
         if self.location.capacity:
-            return 100 * len(self.registration_list) // int(self.location.capacity)
+            return 100 * self.student_count // int(self.location.capacity)
         return "N/A"
 
     @property
@@ -520,6 +783,111 @@ class ExamLocation(models.Model):
         return range(count, upto)
 
 
+################################################################
+
+models.signals.post_save.connect(examlocation_changed_handler, sender=ExamLocation)
+models.signals.post_delete.connect(examlocation_changed_handler, sender=ExamLocation)
+
+if (USE_CACHE and conf.get("cache_registration_signals")) or conf.get(
+    "seating:cache_timeout"
+):
+    models.signals.post_save.connect(
+        registration_changed_handler, sender=Student_Registration
+    )
+    models.signals.post_delete.connect(
+        registration_changed_handler, sender=Student_Registration
+    )
+
+################################################################
+
+
+@python_2_unicode_compatible
+class RoomSplitJob(models.Model):
+    """
+    A room split done in the background (see ``exams.utils.background``).
+    """
+
+    STATUS_CHOICES = (
+        ("pending", "Pending"),
+        ("running", "Running"),
+        ("done", "Done"),
+        ("failed", "Failed"),
+    )
+
+    created = models.DateTimeField(
+        auto_now_add=True, editable=False, verbose_name="creation time"
+    )
+    modified = models.DateTimeField(
+        auto_now=True, editable=False, verbose_name="last modification time"
+    )
+
+    exam = models.ForeignKey(Exam, on_delete=models.CASCADE)
+    status = models.CharField(max_length=8, choices=STATUS_CHOICES, default="pending")
+
+    # room split options:
+    min_ratio = models.FloatField()
+    max_ratio = models.FloatField()
+    max_tries = models.PositiveIntegerField()
+    max_seconds = models.FloatField(null=True, blank=True)
+    strategy = models.CharField(max_length=16)
+    recompute = models.BooleanField(default=False)
+
+    # results:
+    score = models.PositiveIntegerField(null=True, blank=True)
+    tries = models.PositiveIntegerField(default=0)
+    successes = models.PositiveIntegerField(default=0)
+    seconds = models.FloatField(null=True, blank=True)
+    message = models.TextField(blank=True)
+
+    class Meta:
+        ordering = ["-created"]
+
+    def __str__(self):
+        return "Room split for {}".format(self.exam)
+
+    @property
+    def finished(self):
+        return self.status in ["done", "failed"]
+
+    @property
+    def lost_after(self):
+        """
+        The number of seconds after it was last updated that an
+        unfinished job is taken to be lost; see ``fail_if_lost()``.
+        """
+        return (self.max_seconds or 0) + conf.get("room_splits:lost_job_seconds")
+
+    def fail_if_lost(self):
+        """
+        Mark the job as failed if it has not finished long after it was
+        last updated; the process running it has probably restarted.
+        Returns whether it was.
+        """
+        if self.finished:
+            return False
+        if now() - self.modified < datetime.timedelta(seconds=self.lost_after):
+            return False
+        self.status = "failed"
+        self.message = "The room split was lost (the server may have restarted)."
+        self.save()
+        return True
+
+    def status_dict(self):
+        """
+        The current status of this job, for the status endpoint.
+        """
+        return {
+            "status": self.status,
+            "status_display": self.get_status_display(),
+            "finished": self.finished,
+            "score": self.score,
+            "tries": self.tries,
+            "successes": self.successes,
+            "seconds": self.seconds,
+            "message": self.message,
+        }
+
+
 ################################################################
 
 
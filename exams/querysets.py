@@ -8,6 +8,7 @@ import operator
 from functools import reduce
 
 from django.db import models
+from django.db.models.functions import Coalesce, Lower
 from django.utils.timezone import now
 
 from . import conf
@@ -55,6 +56,40 @@ class ExamQuerySet(models.query.QuerySet):
             dt = now().replace(hour=0, minute=0, second=0, microsecond=0)
         return self.filter(dtstart__lt=dt)
 
+    def overlapping(self, dtstart, dtend):
+        """
+        Restricts to exams which overlap the time from dtstart to dtend.
+        The end of an exam is not stored, so the longest exam sets how
+        far back to look.
+        """
+        longest = self.aggregate(longest=models.Max("duration"))["longest"] or 0
+        qs = self.filter(
+            dtstart__lt=dtend,
+            dtstart__gt=dtstart - datetime.timedelta(minutes=longest),
+        )
+        pk_list = [
+            exam.pk for exam in qs.only("dtstart", "duration") if exam.dtend > dtstart
+        ]
+        return self.filter(pk__in=pk_list)
+
+    def for_listing(self):
+        """
+        Prefetch what is needed to list these exams: the sections with
+        their courses and terms, and the active locations with their
+        classrooms (see ``Exam.active_locations``).
+        """
+        from .models import ExamLocation
+
+        return self.prefetch_related(
+            "sections__course",
+            "sections__term",
+            models.Prefetch(
+                "examlocation_set",
+                queryset=ExamLocation.objects.active().select_related("location"),
+                to_attr="_active_locations",
+            ),
+        )
+
     def for_course(self, course):
         """
         Return all of the exams for a particular course.
@@ -71,7 +106,7 @@ class ExamQuerySet(models.query.QuerySet):
             id__in=self.values_list("sections__course_id", flat=True)
         )
 
-    search_fields = ["slug", "verbose_name"]
+    search_fields = ["slug", "verbose_name", "course_label", "term_label"]
 
     def search(self, *criteria):
         """
@@ -115,6 +150,76 @@ class ExamQuerySet(models.query.QuerySet):
 ################################################################
 
 
+class ExamLocationQuerySet(models.query.QuerySet):
+    """
+    Custom query set for exam locations.
+    """
+
+    def active(self):
+        """
+        Filter out non-active objects
+        """
+        return self.filter(active=True)
+
+    def with_student_count(self):
+        """
+        Annotate each location with ``next_start_letter`` (of the next
+        active location of its exam, or None) and ``db_student_count``,
+        the number of students whose surnames fall between them.  The
+        counting is done in the database, in the same query.
+        The database collation decides how surnames with punctuation
+        compare, so these may (rarely) differ from ``roster``.
+        """
+        from students.models import Student_Registration
+
+        next_start = (
+            self.model.objects.filter(
+                exam=models.OuterRef("exam"),
+                active=True,
+                start_letter__gt=models.OuterRef("start_letter"),
+            )
+            .order_by("start_letter")
+            .values("start_letter")[:1]
+        )
+        qs = self.annotate(next_start_letter=models.Subquery(next_start)).annotate(
+            # see ExamLocation.roster for the blank start letter.
+            start_bound=models.Case(
+                models.When(start_letter="", then=models.Value("a")),
+                default=Lower("start_letter"),
+                output_field=models.CharField(),
+            ),
+            finish_bound=Coalesce(Lower("next_start_letter"), models.Value("|")),
+        )
+        registrations = (
+            Student_Registration.objects.reg_list(
+                section__exam=models.OuterRef("exam"),
+                good_standing=True,
+                aurora_verified=True,
+            )
+            .annotate(sn_lower=Lower("student__person__sn"))
+            .filter(
+                sn_lower__gte=models.OuterRef("start_bound"),
+                sn_lower__lt=models.OuterRef("finish_bound"),
+            )
+            .order_by()
+            .annotate(count=models.Func(models.F("pk"), function="COUNT"))
+            .values("count")
+        )
+        return qs.annotate(
+            db_student_count=models.Case(
+                # a blank start letter, but not the only location.
+                models.When(start_letter="", next_start_letter__isnull=False, then=0),
+                default=models.Subquery(
+                    registrations, output_field=models.IntegerField()
+                ),
+                output_field=models.IntegerField(),
+            )
+        )
+
+
+################################################################
+
+
 class ExamFileQuerySet(models.query.QuerySet):
     def course_qs(self):
         """
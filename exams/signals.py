@@ -6,6 +6,11 @@ from __future__ import print_function, unicode_literals
 from django.db.utils import IntegrityError
 from django.template.defaultfilters import slugify
 
+from . import conf
+from .utils.exam_cache import bump_exam_cache_version
+from .utils.feeds import calendar_files_changed
+from .utils.seating import seating_changed
+
 ################################################################
 
 ################################################################
@@ -22,7 +27,12 @@ def exam_m2m_changed_handler(
         See also ``ExamForm`` for validation, rather than the
         integrity check.
     * ``post_add`` fixes up slugs.
+    * any change updates the exams' course and term labels, and makes
+        what is cached for them out of date.
     """
+    if action in ["pre_clear", "post_add", "post_remove", "post_clear"]:
+        _sections_changed(instance, action, reverse, model, pk_set)
+
     if action == "pre_add":
         for section_pk in pk_set:
             qs = instance.__class__.objects.filter(
@@ -62,3 +72,93 @@ def exam_m2m_changed_handler(
 
 
 ################################################################
+
+
+def _exam_changed(exam_pk):
+    """
+    Bump the exam's cache version, if anything is cached for exams;
+    the seating index and static calendar files are out of date.
+    """
+    if conf.get("cache_enabled"):
+        bump_exam_cache_version(exam_pk)
+    seating_changed()
+    calendar_files_changed()
+
+
+################################################################
+
+
+def exam_changed_handler(sender, instance, **kwargs):
+    """
+    ``post_save`` and ``post_delete`` for exams; what is cached for the
+    exam (e.g., its times in the seating index) is out of date.
+    """
+    _exam_changed(instance.pk)
+
+
+################################################################
+
+
+def _sections_changed(instance, action, reverse, model, pk_set):
+    """
+    Update the labels and bump the cache version of each exam whose
+    sections changed.
+    """
+    if not reverse:
+        if action != "pre_clear":
+            instance.update_labels()
+        _exam_changed(instance.pk)
+        instance._roster = None
+        instance._location_rosters = None
+        return
+    if action == "pre_clear":
+        # the exams of a section being cleared are only known beforehand.
+        instance._cleared_exam_pks = list(
+            model.objects.filter(sections=instance).values_list("pk", flat=True)
+        )
+        return
+    if action == "post_clear":
+        pk_set = getattr(instance, "_cleared_exam_pks", [])
+    for exam in model.objects.filter(pk__in=list(pk_set or [])):
+        exam.update_labels()
+        _exam_changed(exam.pk)
+
+
+################################################################
+
+
+def examlocation_changed_handler(sender, instance, **kwargs):
+    """
+    ``post_save`` and ``post_delete`` for exam locations; the exam's
+    location boundaries (see ``Exam.location_boundaries``) and rosters
+    are out of date.
+    """
+    _exam_changed(instance.exam_id)
+    if sender.exam.is_cached(instance):
+        instance.exam._location_boundaries = None
+        instance.exam._location_rosters = None
+        instance.exam._active_locations = None
+
+
+################################################################
+
+
+def registration_changed_handler(sender, instance, **kwargs):
+    """
+    ``post_save`` and ``post_delete`` for student registrations; the
+    seating index is out of date and, when ``cache_registration_signals``
+    is set, so are the rosters of the exams for the registration's
+    section.
+    """
+    from .models import Exam
+
+    seating_changed()
+    if not (conf.get("cache_enabled") and conf.get("cache_registration_signals")):
+        return
+    for pk in Exam.objects.filter(sections=instance.section_id).values_list(
+        "pk", flat=True
+    ):
+        bump_exam_cache_version(pk)
+
+
+################################################################
@@ -0,0 +1,313 @@
+"""
+Tests for the exams app: the room split searches (against brute force,
+on small random classes), rosters and their counts, and the calendar
+feeds.
+"""
+from __future__ import division, print_function, unicode_literals
+
+import datetime
+from itertools import combinations, permutations
+from random import Random
+
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.urls import reverse
+from django.utils.timezone import now
+
+from .utils.room_splits import (
+    CutoffIndex,
+    InvalidCutoff,
+    SplitRoom,
+    letter_cutoff,
+    room_occupancy,
+    split_rooms,
+)
+
+################################################################
+
+
+def random_class(rng, students=(8, 24), rooms=(2, 4)):
+    """
+    Random (lower case) surnames and rooms; short surnames from a few
+    letters, so there are plenty of repeats and shared prefixes.
+    """
+    surnames = [
+        "".join([rng.choice("abcd") for i in range(rng.randint(1, 3))])
+        for j in range(rng.randint(*students))
+    ]
+    classrooms = [
+        SplitRoom(pk, rng.choice([10, 15, 20, 30, 40]))
+        for pk in range(rng.randint(*rooms))
+    ]
+    return surnames, classrooms
+
+
+def room_counts(result, surnames):
+    """
+    The number of people in each room of a split; each goes to the last
+    room which starts at or before their surname.
+    """
+    counts = [0] * len(result.start_list)
+    for name in surnames:
+        i = max([i for i, start in enumerate(result.start_list) if start <= name])
+        counts[i] += 1
+    return counts
+
+
+################################################################
+
+
+def brute_force_exact(classrooms, surnames, min_ratio, max_ratio):
+    """
+    The lowest score of any split, in any order of rooms, with each room
+    between ``min_ratio`` and ``max_ratio`` full; or None.
+    """
+    names = sorted(set(surnames))
+    surnames = sorted(surnames)
+    cuts = []
+    for prev, name in zip(names, names[1:]):
+        cutoff = letter_cutoff(prev, name, None)
+        if cutoff.isalpha():
+            cuts.append((surnames.index(name), cutoff))
+    best = None
+    for order in permutations(classrooms):
+        bounds = [
+            (max(1, -(-r.capacity * min_ratio // 1)), int(r.capacity * max_ratio))
+            for r in order
+        ]
+        for chosen in combinations(cuts, len(order) - 1):
+            positions = [0] + [j for j, cutoff in chosen] + [len(surnames)]
+            counts = [b - a for a, b in zip(positions, positions[1:])]
+            if not all([lo <= c <= hi for c, (lo, hi) in zip(counts, bounds)]):
+                continue
+            score = 1 + sum([len(cutoff) ** 2 for j, cutoff in chosen])
+            if best is None or score < best:
+                best = score
+    return best
+
+
+def brute_force_permutations(classrooms, surnames):
+    """
+    The lowest score of the sequential split (see ``sequential_split()``)
+    of any order of rooms, where no room holds more than its capacity;
+    or None.
+    """
+    index = CutoffIndex(sorted(surnames))
+    ratio = sum([r.capacity for r in classrooms]) / len(surnames)
+    best = None
+    for order in permutations(classrooms):
+        score, j, seated = 1, room_occupancy(order[0], ratio), 0
+        try:
+            for prev, room in zip(order, order[1:]):
+                start, k = index.slice_start(j, order)
+                if k - seated > prev.capacity:
+                    raise InvalidCutoff(order)
+                score += len(start) ** 2
+                seated = k
+                j += room_occupancy(room, ratio)
+        except InvalidCutoff:
+            continue
+        if len(surnames) - seated > order[-1].capacity:
+            continue
+        if best is None or score < best:
+            best = score
+    return best
+
+
+################################################################
+
+
+class RoomSplitTests(SimpleTestCase):
+    """
+    The searches, on small random classes.
+    """
+
+    def test_exact_matches_brute_force(self):
+        rng = Random(1)
+        for case in range(40):
+            surnames, classrooms = random_class(rng)
+            min_ratio = rng.choice([0.0, 0.1])
+            result = split_rooms(
+                "exact",
+                classrooms,
+                surnames,
+                max_tries=1000,
+                min_ratio=min_ratio,
+                max_ratio=0.5,
+                seed=case,
+            )
+            expected = brute_force_exact(classrooms, surnames, min_ratio, 0.5)
+            self.assertEqual(result.score, expected, (surnames, classrooms))
+            if result.score is None:
+                continue
+            rooms = dict((r.pk, r) for r in classrooms)
+            for pk, count in zip(result.classrooms, room_counts(result, surnames)):
+                self.assertLessEqual(count, rooms[pk].capacity * 0.5)
+                self.assertGreaterEqual(count, rooms[pk].capacity * min_ratio)
+
+    def test_permutations_matches_brute_force(self):
+        rng = Random(2)
+        for case in range(40):
+            surnames, classrooms = random_class(rng)
+            result = split_rooms("permutations", classrooms, surnames)
+            expected = brute_force_permutations(classrooms, surnames)
+            self.assertEqual(result.score, expected, (surnames, classrooms))
+
+    def test_bisection_never_overfills(self):
+        rng = Random(3)
+        found = 0
+        for case in range(100):
+            surnames, classrooms = random_class(rng, students=(8, 60), rooms=(2, 6))
+            result = split_rooms(
+                "bisection", classrooms, surnames, max_tries=20, seed=case
+            )
+            if result.score is None:
+                continue
+            found += 1
+            self.assertEqual(result.start_list, sorted(set(result.start_list)))
+            rooms = dict((r.pk, r) for r in classrooms)
+            counts = room_counts(result, surnames)
+            self.assertEqual(sum(counts), len(surnames))
+            for pk, count in zip(result.classrooms, counts):
+                self.assertLessEqual(count, rooms[pk].capacity * 0.5)
+        self.assertTrue(found)
+
+
+################################################################
+
+
+def make_section(suffix="A01"):
+    from classes.models import Course, Department, Section, Semester
+
+    department, created = Department.objects.get_or_create(
+        code="STAT", name="Statistics"
+    )
+    course, created = Course.objects.get_or_create(department=department, code="1000")
+    term, created = Semester.objects.get_or_create(year=2026, term="3")
+    return Section.objects.create(course=course, term=term, section_name=suffix)
+
+
+def register(section, sn, number):
+    from students.models import Person, Student, Student_Registration
+
+    person = Person.objects.create(sn=sn, given_name="Pat")
+    student = Student.objects.create(person=person, student_number=number)
+    return Student_Registration.objects.create(
+        student=student, section=section, good_standing=True, aurora_verified=True
+    )
+
+
+def make_exam(slug="midterm", days=7):
+    from .models import Exam, ExamType
+
+    exam_type, created = ExamType.objects.get_or_create(
+        slug="midterm", verbose_name="Midterm"
+    )
+    return Exam.objects.create(
+        verbose_name="Midterm",
+        type=exam_type,
+        slug=slug,
+        dtstart=now() + datetime.timedelta(days=days),
+        duration=90,
+        public=True,
+    )
+
+
+################################################################
+
+
+class RosterTests(TestCase):
+    """
+    Exam and location rosters, and the student counts of locations.
+    """
+
+    def setUp(self):
+        from places.models import ClassRoom
+
+        from .models import ExamLocation
+
+        self.section = make_section()
+        self.exam = make_exam()
+        self.exam.sections.set([self.section])
+        surnames = ["Adams", "abel", "Baker", "Chen", "Mac", "McDonald", "Smith"]
+        for i, sn in enumerate(surnames + ["Zhang", "smith"]):
+            register(self.section, sn, "%07d" % i)
+        for start in ["a", "c", "mc", "s"]:
+            ExamLocation.objects.create(
+                exam=self.exam,
+                location=ClassRoom.objects.create(capacity=40),
+                start_letter=start,
+            )
+
+    def test_student_count_matches_roster(self):
+        from .models import ExamLocation
+
+        locations = ExamLocation.objects.active().with_student_count()
+        self.assertEqual(len(locations), 4)
+        total = 0
+        for location in locations:
+            roster = ExamLocation.objects.get(pk=location.pk).roster
+            self.assertEqual(location.student_count, len(roster))
+            total += len(roster)
+        self.assertEqual(total, len(self.exam.roster))
+
+    def test_registration_list(self):
+        from .models import ExamLocation
+
+        for location in ExamLocation.objects.active():
+            self.assertEqual(
+                [reg.pk for reg in location.registration_list],
+                [entry.pk for entry in location.roster],
+            )
+            for reg, entry in zip(location.registration_list, location.roster):
+                self.assertEqual(entry.name, "{}".format(reg.student))
+
+    def test_registration_changes_roster(self):
+        from .models import Exam
+
+        self.assertEqual(len(Exam.objects.get(pk=self.exam.pk).roster), 9)
+        reg = register(self.section, "Nguyen", "0000100")
+        self.assertEqual(len(Exam.objects.get(pk=self.exam.pk).roster), 10)
+        reg.delete()
+        self.assertEqual(len(Exam.objects.get(pk=self.exam.pk).roster), 9)
+
+    def test_section_changes_roster(self):
+        other = make_section("A02")
+        register(other, "Nguyen", "0000100")
+        self.assertEqual(len(self.exam.roster), 9)
+        self.exam.sections.add(other)
+        self.assertEqual(len(self.exam.roster), 10)
+        self.exam.sections.remove(self.section)
+        self.assertEqual(len(self.exam.roster), 1)
+
+
+################################################################
+
+
+@override_settings(ROOT_URLCONF="exams.urls")
+class CalendarTests(TestCase):
+    """
+    The iCal feeds, and their conditional requests.
+    """
+
+    def setUp(self):
+        self.exam = make_exam()
+        self.exam.sections.set([make_section()])
+
+    def test_not_modified(self):
+        url = reverse("exams-calendar")
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertIn(b"BEGIN:VEVENT", b"".join(response.streaming_content))
+        etag = response["ETag"]
+
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+
+        self.exam.duration = 120
+        self.exam.save()
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response["ETag"], etag)
+
+
+################################################################
@@ -45,5 +45,21 @@ urlpatterns = [
         r"^room-poster/(?P<slug>[\w-]+)/$", views.room_poster, name="exams-room-poster"
     ),
     url(r"^calendar/$", views.exam_calendar, name="exams-calendar"),
+    url(
+        r"^calendar/course/(?P<course>[\w-]+)/$",
+        views.exam_calendar,
+        name="exams-calendar-course",
+    ),
+    url(
+        r"^calendar/section/(?P<section>[\d]+)/$",
+        views.exam_calendar,
+        name="exams-calendar-section",
+    ),
+    url(
+        r"^calendar/term/(?P<year>[\d]{4})/(?P<term>[\w-]+)/$",
+        views.exam_calendar,
+        name="exams-calendar-term",
+    ),
+    url(r"^where/$", views.seating_lookup, name="exams-seating-lookup"),
     url(r"^(?P<slug>[\w-]+)/$", views.exam_detail, name="exams-detail"),
 ]
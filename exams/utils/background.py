@@ -0,0 +1,126 @@
+"""
+Room splits in the background, so they do not tie up a web worker.
+
+Jobs are recorded in the database (``RoomSplitJob``), so any web process
+can report on them; the work is done by a small thread pool in the
+process which received the request.  Other work (building the seating
+index, writing the calendar files) uses the same pool, with
+``run_in_background()``; with the default of one thread
+(``room_splits:background_threads``), all of it is done one task after
+another, so a long room split holds up the rest.  Errors are logged to
+the "exams.utils.background" logger.
+"""
+from __future__ import print_function, unicode_literals
+
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from threading import Lock
+
+from django.core.exceptions import ValidationError
+from django.db import close_old_connections, connection, transaction
+
+from .. import conf
+
+################################################################
+
+logger = logging.getLogger(__name__)
+
+_executor = None
+_executor_lock = Lock()
+
+################################################################
+
+
+def _get_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=conf.get("room_splits:background_threads")
+            )
+    return _executor
+
+
+################################################################
+
+
+def _call_in_thread(func, args):
+    close_old_connections()
+    try:
+        func(*args)
+    except Exception:
+        # there is no one else to report this to.
+        logger.exception("Background task %r failed", func)
+    finally:
+        connection.close()
+
+
+def run_in_background(func, *args):
+    """
+    Call ``func(*args)`` in the thread pool, with its own database
+    connection.
+    """
+    _get_executor().submit(_call_in_thread, func, args)
+
+
+################################################################
+
+
+def run_room_split_job(job_pk):
+    """
+    Do the room split for a job, and save the result to the job;
+    run by ``run_in_background()``.
+    """
+    from ..models import RoomSplitJob
+    from .room_splits import do_room_splits
+
+    job = RoomSplitJob.objects.select_related("exam").get(pk=job_pk)
+    job.status = "running"
+    job.save()
+    stats = {}
+    try:
+        job.score = do_room_splits(
+            job.exam,
+            commit=True,
+            max_tries=job.max_tries,
+            min_ratio=job.min_ratio,
+            max_ratio=job.max_ratio,
+            strategy=job.strategy,
+            workers=conf.get("room_splits:workers"),
+            max_seconds=job.max_seconds,
+            stats=stats,
+            recompute=job.recompute,
+        )
+    except ValidationError as e:
+        job.status = "failed"
+        job.message = " ".join(e.messages)
+    except Exception as e:
+        logger.exception("Room split job %r failed", job_pk)
+        job.status = "failed"
+        job.message = "Unexpected error: {!r}".format(e)
+    else:
+        job.status = "done"
+        if stats.get("cached"):
+            job.message = (
+                "The split found earlier for these students and rooms was used."
+            )
+        if "moved" in stats:
+            job.message = "{moved} students changed rooms.".format(**stats)
+    job.tries = stats.get("tries", 0)
+    job.successes = stats.get("successes", 0)
+    job.seconds = stats.get("seconds", None)
+    job.save()
+
+
+################################################################
+
+
+def submit_room_split_job(job):
+    """
+    Start the room split for a job once the current transaction
+    has been committed (so the job can be seen by the worker thread).
+    """
+    transaction.on_commit(lambda: run_in_background(run_room_split_job, job.pk))
+
+
+################################################################
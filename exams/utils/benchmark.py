@@ -0,0 +1,218 @@
+"""
+Benchmarks for the room split searches, on synthetic classes.
+
+Nothing here touches the database: surnames and classrooms are made up
+(see ``synthetic_surnames()`` and ``synthetic_classrooms()``), and a
+given seed always makes the same ones.  See ``exams.cli.benchmark``.
+
+Django settings are still needed, as ``exams.conf`` reads them when it
+is imported (by every module in ``exams.utils``), and the searches read
+``room_splits:numpy``.  ``./manage.py exams benchmark`` has them; to run
+it without a project, call ``settings.configure(ADMINS=[...])`` (ADMINS
+gives ``exams.conf`` its ``admin_contact``) before importing this;
+neither ``django.setup()`` nor a database is needed.
+"""
+from __future__ import division, print_function, unicode_literals
+
+import platform
+import tracemalloc
+from datetime import datetime
+from random import Random
+
+from . import vectorized
+from .room_splits import SplitRoom, split_rooms
+
+################################################################
+
+# Common surnames, most common first.  Clustered distributions draw
+# from these (with weights falling off as 1/rank); real classes have
+# long runs of a few of them.
+COMMON_SURNAMES = [
+    "nguyen",
+    "smith",
+    "li",
+    "wang",
+    "singh",
+    "kaur",
+    "patel",
+    "tran",
+    "brown",
+    "lee",
+    "martin",
+    "zhang",
+    "chen",
+    "wilson",
+    "johnson",
+    "roy",
+    "thompson",
+    "macdonald",
+    "mcdonald",
+    "white",
+]
+
+SYLLABLES = [
+    "an",
+    "ber",
+    "ca",
+    "del",
+    "er",
+    "fo",
+    "gar",
+    "ha",
+    "in",
+    "jo",
+    "ka",
+    "lo",
+    "ma",
+    "ne",
+    "or",
+    "pe",
+    "qui",
+    "ro",
+    "sa",
+    "ta",
+    "ul",
+    "va",
+    "wi",
+    "yo",
+    "zu",
+]
+
+# distribution name -> fraction of students with a common surname
+DISTRIBUTIONS = {"uniform": 0.0, "clustered": 0.15, "heavy": 0.4}
+
+# The mix of room sizes classrooms are drawn from.
+ROOM_CAPACITIES = [40, 48, 60, 72, 90, 120, 150, 200, 250, 300, 400]
+
+DEFAULT_SIZES = [50, 200, 1000, 5000]
+
+# The default time limit for each search, in seconds; without one, the
+# exhaustive searches take minutes on the largest classes.
+DEFAULT_MAX_SECONDS = 2.0
+
+################################################################
+
+
+def synthetic_surnames(count, distribution="clustered", seed=0):
+    """
+    A sorted list of ``count`` lower case surnames.
+    """
+    rng = Random(seed)
+    common = DISTRIBUTIONS[distribution]
+    weights = [1.0 / rank for rank in range(1, len(COMMON_SURNAMES) + 1)]
+    result = []
+    for i in range(count):
+        if rng.random() < common:
+            result.append(rng.choices(COMMON_SURNAMES, weights)[0])
+        else:
+            parts = [rng.choice(SYLLABLES) for j in range(rng.randint(2, 4))]
+            result.append("".join(parts))
+    result.sort()
+    return result
+
+
+################################################################
+
+
+def synthetic_classrooms(students, occupancy=0.42, seed=0):
+    """
+    Enough classrooms (at least two) to seat ``students`` at about
+    the given occupancy ratio; each is a ``SplitRoom``.
+    """
+    rng = Random(seed)
+    # smaller classes get smaller rooms.
+    sizes = [c for c in ROOM_CAPACITIES if c * occupancy <= students / 2]
+    sizes = sizes or ROOM_CAPACITIES[:1]
+    rooms = []
+    total = 0
+    while len(rooms) < 2 or total * occupancy < students:
+        capacity = rng.choice(sizes)
+        rooms.append(SplitRoom(len(rooms) + 1, capacity))
+        total += capacity
+    return rooms
+
+
+################################################################
+
+
+def run_case(strategy, classrooms, surnames, seed, options, memory=True):
+    """
+    Run one search (see ``room_splits.split_rooms()``), and measure it.
+    ``options`` are passed on to the search.
+    Memory is measured by running the search again, since tracing
+    allocations slows down the search.
+    """
+    result = split_rooms(strategy, classrooms, surnames, seed=seed, **options)
+    peak = None
+    if memory:
+        tracemalloc.start()
+        try:
+            split_rooms(strategy, classrooms, surnames, seed=seed, **options)
+            current, peak = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+    tries = result.tries
+    return {
+        "strategy": strategy,
+        "students": len(surnames),
+        "rooms": len(classrooms),
+        "lower_bound": len(classrooms),
+        "best_score": result.score,
+        "tries": tries,
+        "successes": result.successes,
+        "success_rate": result.successes / tries if tries else None,
+        "seconds": result.seconds,
+        "seconds_per_try": result.seconds / tries if tries else None,
+        "peak_memory_kb": peak // 1024 if peak is not None else None,
+    }
+
+
+################################################################
+
+
+def run_benchmarks(
+    strategies,
+    sizes=None,
+    distributions=None,
+    seed=0,
+    memory=True,
+    verbose=False,
+    options=None,
+):
+    """
+    Run each strategy (by name) on a synthetic class of each size and
+    surname distribution, with the given search ``options``.
+    Returns a dictionary, suitable for saving as JSON.
+    """
+    if options is None:
+        options = {}
+    if sizes is None:
+        sizes = DEFAULT_SIZES
+    if distributions is None:
+        distributions = sorted(DISTRIBUTIONS)
+    results = []
+    for distribution in distributions:
+        for size in sizes:
+            surnames = synthetic_surnames(size, distribution, seed)
+            classrooms = synthetic_classrooms(size, seed=seed)
+            for name in strategies:
+                result = run_case(name, classrooms, surnames, seed, options, memory)
+                result["distribution"] = distribution
+                results.append(result)
+                if verbose:
+                    print(
+                        "{distribution}\t{students}\t{strategy}\t{best_score}\t{successes}/{tries}\t{seconds:.3f}s".format(
+                            **result
+                        )
+                    )
+    return {
+        "created": datetime.now().isoformat(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "numpy": vectorized.numpy.__version__ if vectorized.AVAILABLE else None,
+        "seed": seed,
+        "results": results,
+    }
+
+
+################################################################
@@ -0,0 +1,103 @@
+"""
+Versioned cache keys for what is cached about an exam.
+
+Every key for an exam (and its locations) includes the exam's version
+number, which is kept in the cache with no timeout.  Bumping the version
+(see ``bump_exam_cache_version()``) makes every old key unreachable at
+once; they simply expire.  The signal handlers in ``exams.signals`` bump
+it when the exam, or its sections, locations or registrations change.
+Other versions (e.g., that of ``exams.utils.seating``) are kept the same
+way, with ``cache_version()`` and ``bump_cache_version()``.
+"""
+from __future__ import print_function, unicode_literals
+
+from time import time
+
+from django.core.cache import cache
+
+################################################################
+
+
+def _version_key(exam_pk):
+    return "exams.Exam:%r:version" % (exam_pk,)
+
+
+def _new_version():
+    # not 1: if the version is evicted, it must not repeat an old one.
+    return int(time() * 1000)
+
+
+################################################################
+
+
+def cache_version(key):
+    """
+    The current version kept at the cache key.
+    """
+    version = cache.get(key)
+    if version is None:
+        # add() so that a concurrent bump is not lost.
+        cache.add(key, _new_version(), None)
+        version = cache.get(key, 0)
+    return version
+
+
+################################################################
+
+
+def bump_cache_version(key):
+    """
+    Increase the version kept at the cache key.
+    """
+    try:
+        cache.incr(key)
+    except ValueError:
+        # there was no version yet.
+        cache.set(key, _new_version(), None)
+
+
+################################################################
+
+
+def exam_cache_version(exam_pk):
+    """
+    The current cache version for the exam.
+    """
+    return cache_version(_version_key(exam_pk))
+
+
+################################################################
+
+
+def bump_exam_cache_version(exam_pk):
+    """
+    Make everything cached for the exam out of date.
+    """
+    bump_cache_version(_version_key(exam_pk))
+
+
+################################################################
+
+
+def exam_cache_key(exam_pk, name):
+    """
+    The cache key for ``name`` (e.g., "roster") of the exam.
+    """
+    return "exams.Exam:%r:%d:%s" % (exam_pk, exam_cache_version(exam_pk), name)
+
+
+################################################################
+
+
+def location_cache_key(exam_pk, location_pk, name):
+    """
+    The cache key for ``name`` of one of the exam's locations.
+    """
+    return "exams.ExamLocation:%r:%d:%s" % (
+        location_pk,
+        exam_cache_version(exam_pk),
+        name,
+    )
+
+
+################################################################
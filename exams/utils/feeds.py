@@ -0,0 +1,324 @@
+"""
+iCalendar feeds of exams.
+
+A feed is streamed one VEVENT at a time (see ``calendar_chunks()``),
+with everything the events need prefetched in one pass.  The body is
+cached under the feed's ``FeedState``, which changes whenever an exam or
+one of its locations is saved, added or deleted; the same state answers
+conditional requests (see ``exams.views.exam_calendar``).
+
+Feeds can be for every exam, or just those of a course, section or term
+(see ``feed_queryset()``).  ``feed_files()`` builds all of them at once,
+to be written out as static files (see ``write_calendar_files()``); this
+is done in the background after every change (with the
+``calendar:write_files`` setting), or by ``./manage.py exams calendars``.
+"""
+from __future__ import print_function, unicode_literals
+
+import hashlib
+import os
+import tempfile
+from collections import OrderedDict, namedtuple
+
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import transaction
+from django.db.models import Count, Max
+from django.http import HttpResponse, StreamingHttpResponse
+from django.utils.text import slugify
+from django.utils.timezone import now
+
+from .. import conf
+
+################################################################
+
+CONTENT_TYPE = "text/calendar; charset=utf-8"
+
+CALENDAR_HEADER = (
+    "BEGIN:VCALENDAR\r\n"
+    "VERSION:2.0\r\n"
+    "PRODID:-//django-dept-exams//NONSGML Exams//EN\r\n"
+)
+CALENDAR_FOOTER = "END:VCALENDAR\r\n"
+
+# ``etag`` changes with any change to the exams in the feed (or their
+# locations); ``last_modified`` is the latest modification time.
+FeedState = namedtuple("FeedState", ["etag", "last_modified"])
+
+# Set when the static files are out of date; held while they are written.
+FILES_PENDING_KEY = "exams.calendar:files-pending"
+FILES_WRITING_KEY = "exams.calendar:files-writing"
+FILES_WRITING_TIMEOUT = 600
+
+################################################################
+
+
+def term_slug(term):
+    """
+    How a term (e.g., "Fall Winter") is named in feed urls and files.
+    """
+    return slugify(term)
+
+
+################################################################
+
+
+def feed_queryset(course=None, section=None, year=None, term=None):
+    """
+    The public future exams, for a course (by slug), a section (by pk),
+    or a term (by year and ``term_slug()``); or all of them.
+    """
+    from classes.models import Semester
+
+    from ..models import Exam
+
+    qs = Exam.objects.public().future()
+    if course is not None:
+        qs = qs.filter(sections__course__slug=course)
+    if section is not None:
+        qs = qs.filter(sections__pk=section)
+    if year is not None:
+        term_pks = [
+            pk
+            for pk, name in Semester.objects.filter(year=year).values_list("pk", "term")
+            if term_slug(name) == term_slug(term)
+        ]
+        qs = qs.filter(sections__term__in=term_pks)
+    return qs.distinct()
+
+
+################################################################
+
+
+def feed_state(queryset, name=""):
+    """
+    The ``FeedState`` of the feed ``name`` of the exams in the queryset,
+    found with one aggregate query.  The counts catch deletions, and
+    the date catches exams falling out of date based querysets.
+    """
+    state = queryset.order_by().aggregate(
+        exam_modified=Max("modified"),
+        location_modified=Max("examlocation__modified"),
+        exams=Count("pk", distinct=True),
+        locations=Count("examlocation", distinct=True),
+    )
+    modified = [dt for dt in [state["exam_modified"], state["location_modified"]] if dt]
+    last_modified = max(modified) if modified else None
+    key = "%s|%s|%s|%s|%r|%r" % (
+        name,
+        now().date().isoformat(),
+        state["exam_modified"],
+        state["location_modified"],
+        state["exams"],
+        state["locations"],
+    )
+    etag = hashlib.md5(key.encode("utf-8")).hexdigest()
+    return FeedState(etag, last_modified)
+
+
+################################################################
+
+
+def calendar_chunks(queryset):
+    """
+    Generate the iCalendar for the exams in the queryset, one event
+    at a time.
+    """
+    yield CALENDAR_HEADER
+    for exam in queryset.for_listing():
+        yield exam.vevent().serialize()
+    yield CALENDAR_FOOTER
+
+
+################################################################
+
+
+def _caching(chunks, cache_key, timeout):
+    """
+    Pass on the chunks, and cache all of them once they are done.
+    """
+    body = []
+    for chunk in chunks:
+        body.append(chunk)
+        yield chunk
+    cache.set(cache_key, "".join(body), timeout)
+
+
+################################################################
+
+
+def calendar_response(queryset, state):
+    """
+    The response for the feed with the given ``FeedState``: the cached
+    body, or else the calendar streamed (and cached on the way).
+    """
+    timeout = conf.get("calendar:cache_timeout")
+    cache_key = "exams.calendar:%s" % (state.etag,)
+    body = cache.get(cache_key) if timeout else None
+    if body is not None:
+        return HttpResponse(body, content_type=CONTENT_TYPE)
+    chunks = calendar_chunks(queryset)
+    if timeout:
+        chunks = _caching(chunks, cache_key, timeout)
+    return StreamingHttpResponse(chunks, content_type=CONTENT_TYPE)
+
+
+################################################################
+
+
+def feed_paths(exam):
+    """
+    The static files (see ``feed_files()``) an exam's event goes in.
+    Its sections must be fetched with their courses and terms.
+    """
+    paths = ["all.ics"]
+    for section in exam.sections.all():
+        paths.append("course/%s.ics" % section.course.slug)
+        paths.append("section/%d.ics" % section.pk)
+        paths.append(
+            "term/%d-%s.ics" % (section.term.year, term_slug(section.term.term))
+        )
+    return paths
+
+
+################################################################
+
+
+def feed_files(queryset=None):
+    """
+    Every feed, as an OrderedDict of path -> calendar.  Each event is
+    built once, with everything prefetched in one pass.
+    """
+    if queryset is None:
+        queryset = feed_queryset()
+    events = OrderedDict([("all.ics", [])])
+    for exam in queryset.for_listing():
+        event = exam.vevent().serialize()
+        for path in OrderedDict.fromkeys(feed_paths(exam)):
+            events.setdefault(path, []).append(event)
+    return OrderedDict(
+        (path, CALENDAR_HEADER + "".join(event_list) + CALENDAR_FOOTER)
+        for path, event_list in events.items()
+    )
+
+
+################################################################
+
+
+def replace_file(storage, name, content):
+    """
+    Replace the file ``name`` in the storage with the ``content`` (bytes).
+    On the local file system, the content is written to a temporary file
+    which is renamed into place, so the file is never missing or partly
+    written.
+    """
+    try:
+        path = storage.path(name)
+    except NotImplementedError:
+        # remote storages replace a whole object at once.
+        if storage.exists(name):
+            storage.delete(name)
+        storage.save(name, ContentFile(content))
+        return
+    directory = os.path.dirname(path)
+    if not os.path.isdir(directory):
+        os.makedirs(directory)
+    fd, temp_path = tempfile.mkstemp(dir=directory, prefix=".", suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(content)
+        os.chmod(temp_path, getattr(storage, "file_permissions_mode", None) or 0o644)
+        getattr(os, "replace", os.rename)(temp_path, path)
+    except Exception:
+        os.remove(temp_path)
+        raise
+
+
+################################################################
+
+
+def write_feed_files(storage, root, files):
+    """
+    Write the calendars to the storage, under ``root``, and remove the
+    ones which are no longer there.  Returns the paths written.
+    """
+    written = []
+    for path, body in files.items():
+        name = "%s/%s" % (root, path)
+        replace_file(storage, name, body.encode("utf-8"))
+        written.append(name)
+    for subdir in ["course", "section", "term"]:
+        directory = "%s/%s" % (root, subdir)
+        if not storage.exists(directory):
+            continue
+        for filename in storage.listdir(directory)[1]:
+            name = "%s/%s" % (directory, filename)
+            if filename.endswith(".ics") and name not in written:
+                storage.delete(name)
+    return written
+
+
+################################################################
+
+
+def write_calendar_files(storage=None, root=None, if_changed=False):
+    """
+    Write every feed as a static file (see ``write_feed_files()``),
+    under ``root`` (by default, the ``calendar:storage_root`` setting),
+    along with the etag of the feeds they were written for.  With
+    ``if_changed``, nothing is written if that etag is the same.
+    Returns the paths written.
+    """
+    if storage is None:
+        storage = default_storage
+    if root is None:
+        root = conf.get("calendar:storage_root")
+    state = feed_state(feed_queryset(), "files")
+    stamp = "%s/etag" % (root,)
+    if if_changed and storage.exists(stamp):
+        with storage.open(stamp) as f:
+            if f.read().decode("utf-8").strip() == state.etag:
+                return []
+    written = write_feed_files(storage, root, feed_files())
+    replace_file(storage, stamp, state.etag.encode("utf-8"))
+    return written
+
+
+################################################################
+
+
+def update_calendar_files():
+    """
+    Write the static files while there are changes pending (see
+    ``calendar_files_changed()``), unless they are being written already.
+    """
+    while cache.get(FILES_PENDING_KEY):
+        if not cache.add(FILES_WRITING_KEY, True, FILES_WRITING_TIMEOUT):
+            return
+        try:
+            while cache.get(FILES_PENDING_KEY):
+                cache.delete(FILES_PENDING_KEY)
+                write_calendar_files()
+        finally:
+            cache.delete(FILES_WRITING_KEY)
+
+
+################################################################
+
+
+def calendar_files_changed():
+    """
+    An exam or location has changed; write the static files again in
+    the background once the current transaction is committed, with the
+    ``calendar:write_files`` setting.
+    """
+    from .background import run_in_background
+
+    if not conf.get("calendar:write_files"):
+        return
+    cache.set(FILES_PENDING_KEY, True, None)
+    transaction.on_commit(lambda: run_in_background(update_calendar_files))
+
+
+################################################################
@@ -0,0 +1,195 @@
+"""
+Process pool support for the room split searches.
+
+A search is broken up into a list of "chunks" (a fixed number of tries,
+or all of the room orders with a given prefix).  The chunks are the same
+whether they are run one after another or spread over a process pool,
+and results are merged in chunk order, so both give the same answer.
+
+Workers share the best score found so far, and the position of the first
+chunk to reach the target score; chunks after that one stop early since
+their results can no longer be used.  With a time limit, every chunk stops
+at the deadline and the best result found so far is used; the result then
+depends on how far the search got.
+
+The state of a search is kept per thread, so that searches running at
+the same time (e.g., background room splits) do not share it.
+"""
+from __future__ import print_function, unicode_literals
+
+import signal
+import sys
+import threading
+from concurrent.futures import ProcessPoolExecutor, wait
+from multiprocessing import Value
+from time import time
+
+################################################################
+
+# ``shared`` is (best_score, done_index, deadline) for the search
+# running in this thread (or worker process).
+_local = threading.local()
+
+################################################################
+
+
+def _init_worker(best_score, done_index, deadline):
+    """
+    Process pool initializer.  The main process deals with CTRL+C.
+    """
+    _local.shared = (best_score, done_index, deadline)
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+
+
+################################################################
+
+
+def _get_shared():
+    return getattr(_local, "shared", None)
+
+
+################################################################
+
+
+def stop_requested(chunk_index):
+    """
+    Chunks should check this between tries, and return early when set.
+    """
+    shared = _get_shared()
+    if shared is None:
+        return False
+    best_score, done_index, deadline = shared
+    return done_index.value < chunk_index or time() > deadline
+
+
+################################################################
+
+
+def request_stop():
+    """
+    Ask every running chunk to return what it has so far.
+    """
+    shared = _get_shared()
+    if shared is not None:
+        shared[1].value = -1
+
+
+################################################################
+
+
+def current_best():
+    """
+    The best score found so far by any chunk, or None.
+    """
+    shared = _get_shared()
+    if shared is None:
+        return None
+    value = shared[0].value
+    if value < 0:
+        return None
+    return value
+
+
+################################################################
+
+
+def record_score(chunk_index, score, target_score):
+    """
+    Let the other workers know about a successful try.
+    """
+    shared = _get_shared()
+    if shared is None:
+        return
+    best_score, done_index, deadline = shared
+    with best_score.get_lock():
+        if best_score.value < 0 or score < best_score.value:
+            best_score.value = score
+    if score <= target_score:
+        with done_index.get_lock():
+            if chunk_index < done_index.value:
+                done_index.value = chunk_index
+
+
+################################################################
+
+
+def _merge(results, target_score):
+    """
+    Merge chunk results, in chunk order.
+    Each result is (score, start_list, room_pks, tries, successes).
+    """
+    cb_score, cb_start_list, cb_shuffle = None, None, None
+    tries, successes = 0, 0
+    for score, start_list, room_pks, chunk_tries, chunk_successes in results:
+        tries += chunk_tries
+        successes += chunk_successes
+        if score is not None and (cb_score is None or score < cb_score):
+            cb_score, cb_start_list, cb_shuffle = score, start_list, room_pks
+        if score is not None and score <= target_score:
+            break  # later chunks would not have run in a serial search.
+    return cb_score, cb_start_list, cb_shuffle, tries, successes
+
+
+################################################################
+
+
+def run_chunks(func, chunk_args, target_score, workers=1, max_seconds=None, bound=None):
+    """
+    Run ``func(chunk_index, *args)`` for each set of args in ``chunk_args``
+    and merge the results.
+
+    ``func`` must be a module level function returning
+    (score, start_list, room_pks, tries, successes); and when ``workers``
+    is more than 1, the arguments must be picklable.
+    When ``max_seconds`` is given, chunks stop after that much time.
+    A ``bound`` (e.g., the score of a split found earlier) is the best
+    score to start with, for chunks which prune with ``current_best()``.
+    """
+    best_score = Value("d", -1 if bound is None else bound)
+    done_index = Value("l", len(chunk_args))
+    if max_seconds is None:
+        deadline = float("inf")
+    else:
+        deadline = time() + max_seconds
+    results = []
+
+    if workers is None or workers <= 1 or len(chunk_args) <= 1:
+        previous = _get_shared()
+        _local.shared = (best_score, done_index, deadline)
+        try:
+            for index, args in enumerate(chunk_args):
+                if stop_requested(index):
+                    break
+                results.append(func(index, *args))
+        finally:
+            _local.shared = previous
+        return _merge(results, target_score)
+
+    with ProcessPoolExecutor(
+        max_workers=workers,
+        initializer=_init_worker,
+        initargs=(best_score, done_index, deadline),
+    ) as executor:
+        futures = [
+            executor.submit(func, index, *args) for index, args in enumerate(chunk_args)
+        ]
+        try:
+            if max_seconds is None:
+                wait(futures)
+            else:
+                wait(futures, timeout=max(deadline - time(), 0))
+                # chunks which have not started yet would stop right away.
+                for future in futures:
+                    future.cancel()
+                wait(futures)
+        except KeyboardInterrupt:
+            print("Stopping workers...", file=sys.stderr)
+            done_index.value = -1
+            for future in futures:
+                future.cancel()
+            wait(futures)
+        results = [future.result() for future in futures if not future.cancelled()]
+    return _merge(results, target_score)
+
+
+################################################################
@@ -0,0 +1,236 @@
+"""
+Room allocation for every exam in a time slot, from a shared pool of
+classrooms.
+
+The pool is divided between the exams first, so that no room is booked
+twice (see ``candidate_divisions()``); then each exam's share of rooms is
+split with ``room_splits.split_rooms()``.  Several divisions are tried,
+each one a chunk for ``exams.utils.parallel``, and the best one is saved
+as a single transaction.
+"""
+from __future__ import print_function, unicode_literals
+
+from collections import namedtuple
+from itertools import islice
+from random import Random
+from time import time
+
+from django.db import transaction
+from django.forms import ValidationError
+
+from . import parallel
+from .room_splits import SplitRoom, room_subsets, split_rooms
+
+################################################################
+
+# The number of divisions of the pool of rooms which are tried.
+SLOT_DIVISIONS = 20
+
+# Later divisions give each exam one of this many of its best subsets
+# of the rooms left, at random.
+SUBSET_CHOICES = 3
+
+# Just enough information about an exam for the searches.
+SlotExam = namedtuple("SlotExam", ["pk", "surnames"])
+
+# ``allocations`` is a list of (exam pk, classroom pks, start_list);
+# ``score`` is the total for every exam, or None without a plan.
+SlotPlan = namedtuple(
+    "SlotPlan", ["score", "allocations", "tries", "successes", "seconds"]
+)
+
+################################################################
+
+
+def _divide_rooms(exams, rooms, order, min_ratio, max_ratio, rng=None):
+    """
+    Give each exam, in the given ``order``, the fewest rooms (then the
+    fewest seats) of those left; or with ``rng``, one of its best few.
+    Returns a list of room lists, in the order of ``exams``; or None.
+    """
+    available = list(rooms)
+    division = [None] * len(exams)
+    for i in order:
+        subsets = list(
+            islice(
+                room_subsets(available, len(exams[i].surnames), min_ratio, max_ratio),
+                1 if rng is None else SUBSET_CHOICES,
+            )
+        )
+        if not subsets:
+            return None
+        share = subsets[0] if rng is None else rng.choice(subsets)
+        division[i] = share
+        taken = set([r.pk for r in share])
+        available = [r for r in available if r.pk not in taken]
+    return division
+
+
+################################################################
+
+
+def candidate_divisions(exams, rooms, min_ratio, max_ratio, max_divisions, seed=None):
+    """
+    Distinct ways of dividing the rooms between the exams, with no room
+    used twice.  The first gives the largest exams their rooms first;
+    the rest take the exams in random orders.
+    """
+    rng = Random(seed)
+    order = sorted(range(len(exams)), key=lambda i: -len(exams[i].surnames))
+    division_list = []
+    seen = set()
+    for attempt in range(5 * max_divisions):
+        if len(division_list) >= max_divisions:
+            break
+        division = _divide_rooms(
+            exams, rooms, order, min_ratio, max_ratio, rng if attempt else None
+        )
+        if division is not None:
+            key = tuple([tuple(sorted([r.pk for r in share])) for share in division])
+            if key not in seen:
+                seen.add(key)
+                division_list.append(division)
+        order = list(order)
+        rng.shuffle(order)
+    return division_list
+
+
+################################################################
+
+
+def _division_chunk(chunk_index, exams, division, strategy, options):
+    """
+    Split the rooms of each exam, for one division of the rooms.
+    Returns the total score, the allocations, and the rooms used.
+    """
+    allocations = []
+    total, tries, successes = 0, 0, 0
+    for exam, share in zip(exams, division):
+        if parallel.stop_requested(chunk_index):
+            return None, None, None, tries, successes
+        result = split_rooms(strategy, share, exam.surnames, **options)
+        tries += result.tries
+        successes += result.successes
+        if result.score is None:
+            return None, None, None, tries, successes
+        total += result.score
+        allocations.append((exam.pk, result.classrooms, result.start_list))
+    parallel.record_score(chunk_index, total, 0)
+    room_pks = [r.pk for share in division for r in share]
+    return total, allocations, room_pks, tries, successes
+
+
+################################################################
+
+
+def allocate_slot(
+    exams,
+    classrooms,
+    strategy="exact",
+    min_ratio=0.3,
+    max_ratio=0.5,
+    max_tries=1000,
+    max_divisions=SLOT_DIVISIONS,
+    workers=1,
+    seed=None,
+    max_seconds=None,
+):
+    """
+    Find rooms and start letters for each exam (``SlotExam``) from the
+    shared ``classrooms``.  Divisions of the rooms are evaluated over
+    ``workers`` processes; with ``max_seconds``, the best plan found in
+    that time is used (each exam's search gets its share of the time).
+    Exams without students are left out.  Returns a ``SlotPlan``.
+    """
+    started = time()
+    rooms = [SplitRoom(c.pk, c.capacity) for c in classrooms if c.capacity]
+    exams = [e for e in exams if e.surnames]
+    division_list = candidate_divisions(
+        exams, rooms, min_ratio, max_ratio, max_divisions, seed
+    )
+    options = dict(
+        max_tries=max_tries, min_ratio=min_ratio, max_ratio=max_ratio, seed=seed
+    )
+    if max_seconds is not None and exams:
+        options["max_seconds"] = max_seconds / len(exams)
+    chunk_args = [(exams, division, strategy, options) for division in division_list]
+    # no plan scores 0, so every division is evaluated.
+    score, allocations, room_pks, tries, successes = parallel.run_chunks(
+        _division_chunk, chunk_args, 0, workers=workers, max_seconds=max_seconds
+    )
+    return SlotPlan(score, allocations, tries, successes, time() - started)
+
+
+################################################################
+
+
+def slot_exams(dtstart, dtend):
+    """
+    The active exams which overlap the time slot.
+    """
+    from ..models import Exam
+
+    return Exam.objects.active().overlapping(dtstart, dtend)
+
+
+################################################################
+
+
+def do_slot_allocation(dtstart, dtend, classroom_pool, commit=True, **kwargs):
+    """
+    Allocate rooms from the ``classroom_pool`` to every exam in the time
+    slot; see ``allocate_slot()`` for the other arguments.
+    Returns the ``SlotPlan``, which is saved when ``commit`` is set.
+    """
+    exam_list = list(slot_exams(dtstart, dtend))
+    if not exam_list:
+        raise ValidationError("There are no exams in this time slot")
+    exams = [
+        SlotExam(
+            exam.pk,
+            sorted(
+                n.lower()
+                for n in exam.registration_list.values_list(
+                    "student__person__sn", flat=True
+                )
+            ),
+        )
+        for exam in exam_list
+    ]
+    plan = allocate_slot(exams, classroom_pool, **kwargs)
+    if plan.score is None:
+        raise ValidationError(
+            "Could not find rooms for every exam in this time slot.  More rooms may be needed."
+        )
+    if commit:
+        save_slot_plan(plan)
+    return plan
+
+
+################################################################
+
+
+@transaction.atomic
+def save_slot_plan(plan):
+    """
+    Replace the exam locations of every exam in the plan, all at once.
+    """
+    from places.models import ClassRoom
+
+    from ..models import ExamLocation
+
+    rooms = ClassRoom.objects.in_bulk(
+        [pk for exam_pk, room_pks, start_list in plan.allocations for pk in room_pks]
+    )
+    ExamLocation.objects.filter(
+        exam_id__in=[exam_pk for exam_pk, room_pks, start_list in plan.allocations]
+    ).delete()
+    for exam_pk, room_pks, start_list in plan.allocations:
+        for pk, start_letter in zip(room_pks, start_list):
+            loc = ExamLocation(
+                exam_id=exam_pk, location=rooms[pk], start_letter=start_letter
+            )
+            loc.save()
+
+
+################################################################
@@ -6,15 +6,84 @@ for this.
 """
 from __future__ import print_function, unicode_literals
 
-from random import shuffle
+import hashlib
+import json
+from array import array
+from bisect import bisect_left, bisect_right
+from collections import Counter, OrderedDict, deque, namedtuple
+from itertools import groupby
+from math import ceil, factorial
+from random import Random, randrange
+from time import time
 
+from django.core.cache import cache
 from django.forms import ValidationError
-from places.models import ClassRoom
 
-from ..models import ExamLocation
+from .. import conf
+from . import parallel, vectorized
 
 ################################################################
 
+# Number of tries handed to a worker at a time.
+# Changing this changes which orders a given seed tries.
+CHUNK_TRIES = 50
+
+# Just enough information about a classroom for the searches; these
+# are cheap to send to worker processes.
+SplitRoom = namedtuple("SplitRoom", ["pk", "capacity"])
+
+# What every strategy works from, prepared once by ``split_rooms()``:
+# the rooms (``SplitRoom``), the sorted surnames and their ``CutoffIndex``,
+# the number of seats per student, and the search options.
+SplitProblem = namedtuple(
+    "SplitProblem",
+    [
+        "rooms",
+        "surnames",
+        "index",
+        "seat_ratio",
+        "max_tries",
+        "best_score",
+        "min_ratio",
+        "max_ratio",
+        "workers",
+        "seed",
+        "max_seconds",
+        "bound",
+    ],
+)
+
+# The outcome of ``split_rooms()``; ``classrooms`` are primary keys, in
+# the order of ``start_list``.  The score is None when there is no split.
+SplitResult = namedtuple(
+    "SplitResult",
+    ["strategy", "score", "start_list", "classrooms", "tries", "successes", "seconds"],
+)
+
+# The registered strategies, by name; see ``register_strategy()``.
+Strategy = namedtuple("Strategy", ["name", "label", "func", "admin"])
+STRATEGIES = OrderedDict()
+
+# Incremental splits look this many students either side of each current
+# cut first, and twice as far each time nothing is found.
+INCREMENTAL_WINDOW = 25
+
+# Not a search strategy: see ``do_incremental_room_splits()``.
+INCREMENTAL_CHOICE = ("incremental", "Incremental (keep students where they are)")
+
+# The number of subsets of a pool of rooms tried, before giving up;
+# see ``split_room_pool()``.
+ROOM_POOL_SUBSETS = 10
+
+# Checking every permutation, without pruning:
+#    9! = 362,880 [completes in ~8 sec]
+#   10! = 3,628,800 [projected ~2.5 min]
+#   11! = 39,916,800 [projected ~30 min]
+#   12! = 479,001,600 [completes in ~3.5 hours]
+#   13! [projected ~3 days]
+# Pruning usually cuts this down a great deal, but not always.
+PERMUTATIONS_MAX_ROOMS = 15
+
 ################################################################
 
 
@@ -31,7 +100,43 @@ class InvalidCutoff(Exception):
 ################################################################
 
 
+def register_strategy(name, label, admin=False):
+    """
+    Decorator to register a room split strategy.
+
+    The function is given a ``SplitProblem`` and returns
+    (score, start_list, classrooms, tries, successes), where
+    ``classrooms`` are primary keys; or a score of None.
+    ``admin`` strategies are offered by the room split form.
+    """
+
+    def decorator(func):
+        STRATEGIES[name] = Strategy(name, label, func, admin)
+        return func
+
+    return decorator
+
+
+################################################################
+
+
+def strategy_choices(admin=True):
+    """
+    Choices for a form field of (registered) strategies; the room split
+    form also offers incremental splits.
+    """
+    choices = [(s.name, s.label) for s in STRATEGIES.values() if s.admin or not admin]
+    if admin:
+        choices.append(INCREMENTAL_CHOICE)
+    return choices
+
+
+################################################################
+
+
 def get_exam_classrooms(exam):
+    from places.models import ClassRoom
+
     pk_list = exam.examlocation_set.active().values_list("location_id", flat=True)
     return list(ClassRoom.objects.filter(pk__in=pk_list))
 
@@ -69,6 +174,27 @@ def sanity_checks(exam, classrooms, min_cap_ratio, max_cap_ratio):
 ################################################################
 
 
+def room_splits_cache_key(surnames, classrooms, min_ratio, max_ratio, strategy):
+    """
+    The cache key for the best room split found for these (sorted)
+    surnames and classrooms, with these options.
+    """
+    fingerprint = json.dumps(
+        [
+            surnames,
+            sorted([[c.pk, c.capacity] for c in classrooms]),
+            min_ratio,
+            max_ratio,
+            strategy,
+        ]
+    )
+    digest = hashlib.sha1(fingerprint.encode("utf-8")).hexdigest()
+    return "exams.room_splits:{}".format(digest)
+
+
+################################################################
+
+
 def letter_cutoff(s1, s2, room_list):
     """
     Given two strings (lower case surnames) determine how much they have in common
@@ -96,6 +222,119 @@ def letter_cutoff(s1, s2, room_list):
 ################################################################
 
 
+class CutoffIndex(object):
+    """
+    A run-length summary of a sorted list of surnames, with the start
+    letter(s) and score of a cut before each distinct surname; computed
+    once and shared by every try.
+
+    ``names`` are the distinct surnames, ``counts`` the number of people
+    with each one, and ``offsets[i]`` the number of people before
+    ``names[i]`` (so ``offsets[-1]`` is everyone).  ``cutoff_list[i]``
+    separates ``names[i - 1]`` from ``names[i]`` and ``score_list[i]``
+    is its score; both are None at position 0 (and where the names are
+    out of order).  A sparse table gives the lowest score in any window
+    of positions in constant time.
+    """
+
+    def __init__(self, name_list):
+        self.names = []
+        self.counts = array("l")
+        for name, group in groupby(name_list):
+            self.names.append(name)
+            self.counts.append(sum(1 for item in group))
+        self.offsets = array("l", [0])
+        for count in self.counts:
+            self.offsets.append(self.offsets[-1] + count)
+        self.n = self.offsets[-1]
+
+        m = len(self.names)
+        self.cutoff_list = [None] * m
+        self.score_list = [None] * m
+        for i in range(1, m):
+            n1 = self.names[i - 1]
+            n2 = self.names[i]
+            if n1 < n2:
+                cutoff = letter_cutoff(n1, n2, None)
+                self.cutoff_list[i] = cutoff
+                self.score_list[i] = len(cutoff) ** 2
+
+        # the first cut at or after each position:
+        self.next_cut = [None] * (m + 1)
+        for i in range(m - 1, 0, -1):
+            if self.score_list[i] is not None:
+                self.next_cut[i] = i
+            else:
+                self.next_cut[i] = self.next_cut[i + 1]
+
+        # the (sorted) positions of each score:
+        self._positions = {}
+        for i, score in enumerate(self.score_list):
+            if score is not None:
+                self._positions.setdefault(score, []).append(i)
+
+        # _table[p][i] is the lowest score from i to i + 2 ** p - 1.
+        row = [float("inf") if s is None else s for s in self.score_list]
+        self._table = [row]
+        width = 1
+        while 2 * width <= m:
+            row = [min(row[i], row[i + width]) for i in range(m - 2 * width + 1)]
+            self._table.append(row)
+            width *= 2
+
+    def min_score(self, lo, hi):
+        """
+        The lowest score of a cut at positions ``lo`` to ``hi``
+        (inclusive); infinite when there is none.
+        """
+        if hi < lo:
+            return float("inf")
+        p = (hi - lo + 1).bit_length() - 1
+        row = self._table[p]
+        return min(row[lo], row[hi - (1 << p) + 1])
+
+    def best_cut(self, start, stop, target):
+        """
+        The position of the lowest scoring cut which leaves between
+        ``start`` and ``stop`` people (inclusive) before it, nearest to
+        ``target`` people, preferring the lower position on a tie;
+        or None when there is no such cut.
+        """
+        lo = max(bisect_left(self.offsets, start), 1)
+        hi = min(bisect_right(self.offsets, stop), len(self.names)) - 1
+        score = self.min_score(lo, hi)
+        if score == float("inf"):
+            return None
+        positions = self._positions[score]
+        t = min(max(bisect_right(self.offsets, target) - 1, lo), hi)
+        target = min(max(target, self.offsets[lo]), self.offsets[hi])
+        i = bisect_right(positions, t)
+        below = positions[i - 1] if i > 0 and positions[i - 1] >= lo else None
+        above = positions[i] if i < len(positions) and positions[i] <= hi else None
+        if above is None:
+            return below
+        if below is not None and (
+            target - self.offsets[below] <= self.offsets[above] - target
+        ):
+            return below
+        return above
+
+    def slice_start(self, j, room_list, same_limit=5):
+        """
+        The start letter(s) for a room whose slice of people begins at
+        ``j``, skipping up to ``same_limit`` people with the same surname
+        as the previous room's last person; and the number of people
+        before the first one who actually sorts into that room.
+        """
+        i = self.next_cut[bisect_left(self.offsets, j)] if 0 < j < self.n else None
+        if i is None or self.offsets[i] - j > same_limit:
+            raise InvalidCutoff(room_list, "Two many people with the same surname here")
+        return self.cutoff_list[i], self.offsets[i]
+
+
+################################################################
+
+
 def _classroom_partition(classrooms):
     assert len(classrooms) > 1, "Cannot partition 1 or fewer rooms."
     if len(classrooms) == 2:
@@ -119,111 +358,68 @@ def _classroom_partition(classrooms):
 ################################################################
 
 
-def _best_split(name_list, start, stop, target, classrooms, debug=False):
+def _best_split(index, lo, hi, start, stop, target, classrooms, debug=False):
+    """
+    Find the best place to split the people with surnames ``lo`` up to
+    (but not including) ``hi`` in the cutoff ``index``; the left side
+    gets between ``start`` and ``stop`` people, ideally ``target``.
+    returns cutoff, position of the split
+    """
     # A bunch of input sanitizing and edge case checks
-    cutoff_list = []
-    if start < 1:
-        start = 1
-    if stop >= len(name_list):
-        stop = len(name_list) - 1
+    base = index.offsets[lo]
+    count = index.offsets[hi] - base
+    start = max(start, 1)
+    stop = min(stop, count - 1)
     if stop < start:
-        start, stop = stop, start
-    if start == stop:
-        start = 1
-        stop = len(name_list) - 1
-    if target == start:
-        target += 1
-    if stop - start < 3:
-        name_idx = start + (stop - start) // 2
-        n1 = name_list[name_idx]
-        n2 = name_list[name_idx]
-        if n1 == n2:
-            raise InvalidCutoff(classrooms)
-        cutoff = letter_cutoff(n1, n2, classrooms)
-        names_left = name_list[:name_idx]
-        names_right = name_list[name_idx:]
-        return cutoff, names_left, names_right
-
-    # Final sanity check
-    if not (0 < start < target < stop < len(name_list)):
         if debug:
             print(
                 "Invalid setup sequence: start={} target={} stop={} max={}".format(
-                    start, target, stop, len(name_list)
+                    start, target, stop, count
                 )
             )
         raise InvalidCutoff(classrooms)
     if debug:
-        print(len(name_list), start, stop, target)
-    for i in range(start, stop):
-        n1 = name_list[i]
-        n2 = name_list[i + 1]
-        if not (n1 < n2):
-            cutoff_list.append("-" * 100)
-        else:
-            cutoff_list.append(letter_cutoff(n1, n2, classrooms))
-    score_list = [len(c) ** 2 for c in cutoff_list]
-    min_score = min(score_list)
-    # idx is an index in cutoff_list/score_list
-    adj_target = target - start
-    if score_list.count(min_score) == 1:
-        idx = score_list.index(min_score)
-    else:
-        scores_left, scores_right = score_list[:adj_target], score_list[adj_target:]
-        scores_left.reverse()
-        try:
-            l_idx = scores_left.index(min_score)
-        except ValueError:
-            l_idx = len(score_list)
-        try:
-            r_idx = scores_right.index(min_score)
-        except ValueError:
-            r_idx = len(score_list)
-        if l_idx <= r_idx:
-            idx = adj_target - 1 - l_idx
-        else:
-            idx = adj_target + r_idx
-
-    cutoff = cutoff_list[idx]
-    cutoff_score = len(cutoff) ** 2
-    assert cutoff_score == min_score, "Did *not* determine the correct cutoff point"
-    name_idx = start + idx
-    names_left = name_list[:name_idx]
-    names_right = name_list[name_idx:]
-    return cutoff, names_left, names_right
+        print(count, start, stop, target)
+    i = index.best_cut(base + start, base + stop, base + target)
+    if i is None:
+        raise InvalidCutoff(classrooms)
+    return index.cutoff_list[i], i
 
 
 ################################################################
 
 
 def _bisection_single_try(
-    classrooms, max_ratio, registrations, first_start="a", debug=False
+    classrooms, max_ratio, index, lo, hi, first_start="a", debug=False
 ):
     """
+    Split the people with surnames ``lo`` up to (but not including)
+    ``hi`` in the cutoff ``index`` between these classrooms.
     returns score, start_list
     RECURSIVE.
     """
     assert len(classrooms) > 0, "0 or fewer classrooms"
+    count = index.offsets[hi] - index.offsets[lo]
     if len(classrooms) == 1:
         # tail for recursion
         # final check of ratio:
         cap = classrooms[0].capacity
-        if len(registrations) / cap > max_ratio:
+        if count / cap > max_ratio:
             raise InvalidCutoff(classrooms)
         return len(first_start) ** 2, [first_start]
     c1, c2 = _classroom_partition(classrooms)
     n1 = sum([r.capacity for r in c1])
     n2 = sum([r.capacity for r in c2])
     nT = n1 + n2
-    local_ratio = len(registrations) / nT  # represents the "perfect balance" available
+    local_ratio = count / nT  # represents the "perfect balance" available
     if local_ratio > max_ratio:
         raise InvalidCutoff(classrooms)
     lr1 = int(n1 * local_ratio)
     lr2 = int(n2 * local_ratio)
     max1 = int(n1 * max_ratio)
     max2 = int(n2 * max_ratio)
-    min1 = len(registrations) - max2
-    min2 = len(registrations) - max1
+    min1 = count - max2
+    min2 = count - max1
     if debug:
         print("DEBUG")
         print("c1 =", c1)
@@ -231,31 +427,35 @@ def _bisection_single_try(
         print("c2 =", c2)
         print("    ", [r.capacity for r in c2])
         print("n1, n2, nT =", n1, n2, nT)
-        print("len(registrations) = ", len(registrations))
+        print("count = ", count)
         print("start_letter =", first_start)
         print("local_ratio = ", local_ratio)
         print("min1, lr1, max1 =", min1, lr1, max1)
         print("min2, lr2, max2 =", min2, lr2, max2)
-    cutoff, reg1, reg2 = _best_split(
-        registrations, min1, max1, lr1, classrooms, debug=debug
-    )
+    cutoff, mid = _best_split(index, lo, hi, min1, max1, lr1, classrooms, debug=debug)
     if debug:  # first_start >= cutoff:
         print("cutoff =", cutoff)
-        print("len(reg1) =", len(reg1), "(target: {})".format(lr1))
-        print("len(reg2) =", len(reg2), "(target: {})".format(lr2))
-    if cutoff == "-" * 100:
-        raise InvalidCutoff(classrooms)
+        print(
+            "count1 =",
+            index.offsets[mid] - index.offsets[lo],
+            "(target: {})".format(lr1),
+        )
+        print(
+            "count2 =",
+            index.offsets[hi] - index.offsets[mid],
+            "(target: {})".format(lr2),
+        )
     if first_start == cutoff:
         raise InvalidCutoff(classrooms)
     assert (
         first_start < cutoff
     ), "Some kind of strangeness; first_start={}; cutoff={}".format(first_start, cutoff)
-    if not (reg1 and reg2):
-        raise InvalidCutoff(classrooms)
     score1, cutoff1 = _bisection_single_try(
-        c1, max_ratio, reg1, first_start, debug=debug
+        c1, max_ratio, index, lo, mid, first_start, debug=debug
+    )
+    score2, cutoff2 = _bisection_single_try(
+        c2, max_ratio, index, mid, hi, cutoff, debug=debug
     )
-    score2, cutoff2 = _bisection_single_try(c2, max_ratio, reg2, cutoff, debug=debug)
     score = score1 + score2
     cutoff_list = cutoff1 + cutoff2
     return score, cutoff_list
@@ -264,74 +464,1244 @@ def _bisection_single_try(
 ################################################################
 
 
-def bisection_partition_main(
-    classrooms, ratio, registrations, max_tries, best_score, max_ratio=0.5, debug=False
+def _bisection_chunk(
+    chunk_index,
+    classrooms,
+    max_ratio,
+    index,
+    first,
+    tries,
+    target_score,
+    seed,
+    debug,
 ):
     """
-    Make attempts at bisection/partition splits.  Success ration seems
-    to be about 20%; execution speed is fast for each attempt.
+    Run a chunk of bisection/partition tries (see ``order_chunks()``).
     """
     ntries = 0
     success_count = 0
     cb_score, cb_start_list, cb_shuffle = None, None, None
-    while True:
-        if ntries >= max_tries:
+    for order in chunk_orders(chunk_index, classrooms, first, tries, seed):
+        if parallel.stop_requested(chunk_index):
             break
-        start_list = None
+        ntries += 1
         try:
             score, start_list = _bisection_single_try(
-                classrooms, max_ratio, registrations, debug=debug
+                order, max_ratio, index, 0, len(index.names), debug=debug
             )
         except InvalidCutoff:
-            score = None
+            continue
+        success_count += 1
+        parallel.record_score(chunk_index, score, target_score)
+        if cb_score is None or (score < cb_score):
+            cb_score = score
+            cb_start_list = start_list
+            # (the order may have been reversed during the try)
+            cb_shuffle = [c.pk for c in order]
+        if score <= target_score:
+            break  # we are done
+
+    return cb_score, cb_start_list, cb_shuffle, ntries, success_count
+
+
+################################################################
+
+
+def split_tries(max_tries, seed):
+    """
+    Split ``max_tries`` into chunks; returns a list of (tries, seed).
+    """
+    if seed is None:
+        seed = randrange(2 ** 31)
+    return [
+        (min(CHUNK_TRIES, max_tries - start), seed + index)
+        for index, start in enumerate(range(0, max_tries, CHUNK_TRIES))
+    ]
+
+
+################################################################
+
+
+def count_capacity_orders(classrooms):
+    """
+    The number of distinct sequences of capacities for these classrooms.
+    Rooms with the same capacity are interchangeable for every split
+    method, so this is the size of the search space.
+    """
+    result = factorial(len(classrooms))
+    for count in Counter([r.capacity for r in classrooms]).values():
+        result //= factorial(count)
+    return result
+
+
+################################################################
+
+
+def capacity_orders(classrooms, first=None):
+    """
+    Generate one order of the classrooms for each distinct sequence of
+    capacities (optionally, only those starting with ``classrooms[first]``).
+    Rooms with the same capacity keep their given relative order, so
+    orders come out in the same order as ``itertools.permutations()``.
+    RECURSIVE.
+    """
+    if first is not None:
+        rest = classrooms[:first] + classrooms[first + 1 :]
+        for order in capacity_orders(rest):
+            yield [classrooms[first]] + order
+        return
+    if not classrooms:
+        yield []
+        return
+    seen = set()
+    for i, room in enumerate(classrooms):
+        if room.capacity in seen:
+            continue
+        seen.add(room.capacity)
+        for order in capacity_orders(classrooms, i):
+            yield order
+
+
+################################################################
+
+
+def distinct_firsts(classrooms):
+    """
+    Indexes of the first room of each capacity.
+    """
+    seen = set()
+    result = []
+    for i, room in enumerate(classrooms):
+        if room.capacity not in seen:
+            seen.add(room.capacity)
+            result.append(i)
+    return result
+
+
+################################################################
+
+
+def order_chunks(classrooms, max_tries, seed=None):
+    """
+    Divide up a search over orders of classrooms.
+    Returns a list of (first, tries, seed) for ``chunk_orders()``.
+
+    When there are few enough distinct capacity sequences, all of them
+    are searched, one chunk for each capacity of the first room;
+    otherwise ``max_tries`` random orders are.
+    """
+    if count_capacity_orders(classrooms) <= max_tries:
+        return [(first, None, None) for first in distinct_firsts(classrooms)]
+    return [
+        (None, tries, chunk_seed) for tries, chunk_seed in split_tries(max_tries, seed)
+    ]
+
+
+################################################################
+
+
+def chunk_orders(chunk_index, classrooms, first, tries, seed):
+    """
+    Generate the orders of classrooms for one chunk of ``order_chunks()``.
+    Random orders never repeat a sequence of capacities within a chunk;
+    and the first chunk starts with the given order.
+    """
+    if first is not None:
+        for order in capacity_orders(classrooms, first):
+            yield order
+        return
+    rng = Random(seed)
+    order = list(classrooms)
+    if chunk_index > 0:
+        rng.shuffle(order)
+    seen = set()
+    for attempt in range(tries * 10):
+        key = tuple([c.capacity for c in order])
+        if key not in seen:
+            seen.add(key)
+            yield list(order)
+            if len(seen) >= tries:
+                return
+        rng.shuffle(order)
+
+
+################################################################
+
+
+def room_occupancy(room, ratio):
+    """
+    The number of students seated in this room, at ``ratio`` seats
+    per student.
+    """
+    if not room.capacity:
+        raise RuntimeError("Abort! The room {} has no capacity set!".format(room))
+    count = int(ceil(room.capacity / ratio))
+    assert count <= room.capacity
+    return count
+
+
+################################################################
+
+
+def sequential_split(classrooms, ratio, index):
+    """
+    Split the people in the cutoff ``index`` by the occupancy of each
+    room, in order.
+    returns score, start_list
+    """
+    occupancy_list = [room_occupancy(r, ratio) for r in classrooms]
+    assert sum(occupancy_list) >= index.n
+
+    # Breaks between people with the same surname are avoided by
+    # moving the start of a room up to the next change in surname.
+    start_list = []
+    room_list = []
+    j = 0
+    for room, occupancy in zip(classrooms, occupancy_list):
+        room_list.append(room)
+        if j == 0:
+            start = "a"
         else:
+            start, k = index.slice_start(j, room_list)
+        start_list.append(start)
+        j += occupancy
+
+    # sum of squares to penalize long name breaks
+    return sum([len(s) ** 2 for s in start_list]), start_list
+
+
+################################################################
+
+
+def _shuffle_chunk(
+    chunk_index, classrooms, ratio, index, first, tries, best_score, seed
+):
+    """
+    Run a chunk of sequential splits of shuffled classrooms
+    (see ``order_chunks()``).
+    """
+    if vectorized.AVAILABLE and conf.get("room_splits:numpy"):
+        return _shuffle_chunk_vectorized(
+            chunk_index, classrooms, ratio, index, first, tries, best_score, seed
+        )
+    # for purposes of this function, cb_ indicates "current best"
+    cb_score, cb_start_list, cb_shuffle = None, None, None
+    success_count = 0
+    attempt_count = 0
+    try:
+        for order in chunk_orders(chunk_index, classrooms, first, tries, seed):
+            if parallel.stop_requested(chunk_index):
+                break
+            attempt_count += 1
+            try:
+                score, start_list = sequential_split(order, ratio, index)
+            except InvalidCutoff:
+                continue
             success_count += 1
+            parallel.record_score(chunk_index, score, best_score)
             if cb_score is None or (score < cb_score):
                 cb_score = score
                 cb_start_list = start_list
-                cb_shuffle = [c.pk for c in classrooms]
+                cb_shuffle = [c.pk for c in order]
             if score <= best_score:
                 break  # we are done
-        # setup the next attempt
-        shuffle(classrooms)
+    except KeyboardInterrupt:
+        parallel.request_stop()
+
+    return cb_score, cb_start_list, cb_shuffle, attempt_count, success_count
+
+
+################################################################
+
+
+def _shuffle_chunk_vectorized(
+    chunk_index, classrooms, ratio, index, first, tries, best_score, seed
+):
+    """
+    ``_shuffle_chunk()``, scoring every order of the chunk at once.
+    """
+    order_list = list(chunk_orders(chunk_index, classrooms, first, tries, seed))
+    if not order_list or parallel.stop_requested(chunk_index):
+        return None, None, None, 0, 0
+    position = dict([(c.pk, i) for i, c in enumerate(classrooms)])
+    occupancy = [room_occupancy(r, ratio) for r in classrooms]
+    scores = vectorized.sequential_scores(
+        index, occupancy, [[position[c.pk] for c in order] for order in order_list]
+    )
+    best, attempt_count, success_count = vectorized.first_best(scores, best_score)
+    if best is None:
+        return None, None, None, attempt_count, success_count
+
+    order = order_list[best]
+    score, start_list = sequential_split(order, ratio, index)
+    parallel.record_score(chunk_index, score, best_score)
+    return score, start_list, [c.pk for c in order], attempt_count, success_count
+
+
+################################################################
+
+
+@register_strategy("sequential", "Sequential (rooms in the given order)")
+def _sequential_strategy(problem):
+    """
+    A single split, with the rooms in the order given.
+    """
+    try:
+        score, start_list = sequential_split(
+            problem.rooms, problem.seat_ratio, problem.index
+        )
+    except InvalidCutoff:
+        return None, None, None, 1, 0
+    return score, start_list, [r.pk for r in problem.rooms], 1, 1
+
+
+################################################################
+
+
+@register_strategy("shuffle", "Shuffled (sequential splits)")
+def _shuffle_strategy(problem):
+    """
+    Repeatedly shuffle classrooms in order to find the best match.
+    """
+    chunk_args = [
+        (
+            problem.rooms,
+            problem.seat_ratio,
+            problem.index,
+            first,
+            tries,
+            problem.best_score,
+            chunk_seed,
+        )
+        for first, tries, chunk_seed in order_chunks(
+            problem.rooms, problem.max_tries, problem.seed
+        )
+    ]
+    return parallel.run_chunks(
+        _shuffle_chunk,
+        chunk_args,
+        problem.best_score,
+        workers=problem.workers,
+        max_seconds=problem.max_seconds,
+        bound=problem.bound,
+    )
+
+
+################################################################
+
+
+@register_strategy("bisection", "Bisection (randomized)", admin=True)
+def _bisection_strategy(problem):
+    """
+    Make attempts at bisection/partition splits.  Success ration seems
+    to be about 20%; execution speed is fast for each attempt.
+    Only one order of rooms is tried for each sequence of capacities.
+    """
+    chunk_args = [
+        (
+            problem.rooms,
+            problem.max_ratio,
+            problem.index,
+            first,
+            tries,
+            problem.best_score,
+            chunk_seed,
+            False,
+        )
+        for first, tries, chunk_seed in order_chunks(
+            problem.rooms, problem.max_tries, problem.seed
+        )
+    ]
+    return parallel.run_chunks(
+        _bisection_chunk,
+        chunk_args,
+        problem.best_score,
+        workers=problem.workers,
+        max_seconds=problem.max_seconds,
+        bound=problem.bound,
+    )
+
+
+################################################################
+
+
+def room_occupancy_bounds(classrooms, min_ratio, max_ratio):
+    """
+    Return a list of (low, high) student counts allowed in each room.
+    Every room gets at least one student.
+    """
+    bounds = []
+    for room in classrooms:
+        low = max(1, int(ceil(room.capacity * min_ratio)))
+        high = int(room.capacity * max_ratio)
+        bounds.append((low, high))
+    return bounds
+
+
+################################################################
+
+
+def _cut_points(index):
+    """
+    The positions where a room can begin, from the cutoff ``index``: the
+    number of people before each distinct surname which can start a room,
+    with its start letter(s) and score.  Position 0 (the first room) comes
+    first, with no start letter.  Cutoffs which are not purely
+    alphabetical are left out.
+    Returns position_list, cutoff_list, score_list.
+    """
+    position_list = [0]
+    cutoff_list = [None]
+    score_list = [None]
+    for i in range(1, len(index.names)):
+        cutoff = index.cutoff_list[i]
+        if cutoff is None or not cutoff.isalpha():
+            continue
+        position_list.append(index.offsets[i])
+        cutoff_list.append(cutoff)
+        score_list.append(index.score_list[i])
+    return position_list, cutoff_list, score_list
+
+
+################################################################
+
+
+def _exact_single_order(classrooms, bounds, cut_points, n, bound=None):
+    """
+    Dynamic programming solver for a *fixed* order of classrooms.
+
+    Finds the set of cut positions with the minimum total score,
+    subject to the occupancy bounds of each room.  Ties are broken
+    by how far each cut drifts from a capacity-proportional split.
+    Only the ``cut_points`` (see ``_cut_points()``) from which the
+    remaining rooms can still be filled are considered, and sliding
+    window minimums keep this linear in their number for each room.
+    With a ``bound``, cuts which cannot lead to a split scoring at most
+    the bound are dropped as well.
+
+    returns score, start_list
+    """
+    position_list, cutoff_list, score_list = cut_points
+    k = len(classrooms)
+    m = len(position_list)
+    caps = [r.capacity for r in classrooms]
+    total = sum(caps)
+    # any drift total is strictly less than this, so score dominates.
+    weight = n * k + 1
+    inf = float("inf")
+
+    cost = [inf] * m
+    cost[0] = 0
+    parents = []
+    low_sum, high_sum, cap_sum = 0, 0, 0
+    rest_low = sum([b[0] for b in bounds])
+    rest_high = sum([b[1] for b in bounds])
+    for i in range(1, k):
+        low, high = bounds[i - 1]
+        low_sum += low
+        high_sum += high
+        rest_low -= low
+        rest_high -= high
+        cap_sum += caps[i - 1]
+        target = n * cap_sum / total
+        prev_cost = cost
+        cost = [inf] * m
+        parent = [None] * m
+        window = deque()
+        first = bisect_left(position_list, max(low_sum, n - rest_high))
+        last = bisect_right(position_list, min(high_sum, n - rest_low, n - 1))
+        if first < last:
+            # earlier boundaries are out of every window.
+            p = bisect_left(position_list, position_list[first] - high)
+        for c in range(first, last):
+            j = position_list[c]
+            # slide the window of previous boundaries [j - high, j - low]
+            while p < m and position_list[p] <= j - low:
+                if prev_cost[p] < inf:
+                    while window and prev_cost[window[-1]] >= prev_cost[p]:
+                        window.pop()
+                    window.append(p)
+                p += 1
+            while window and position_list[window[0]] < j - high:
+                window.popleft()
+            if not window:
+                continue
+            c_cost = prev_cost[window[0]] + score_list[c] * weight + abs(j - target)
+            # the first room scores 1, and so does each room after this.
+            if bound is not None and 1 + c_cost // weight + k - 1 - i > bound:
+                continue
+            cost[c] = c_cost
+            parent[c] = window[0]
+        parents.append(parent)
+
+    low, high = bounds[-1]
+    best = None
+    for c in range(
+        bisect_left(position_list, max(0, n - high)),
+        bisect_right(position_list, n - low),
+    ):
+        if cost[c] < inf and (best is None or cost[c] < cost[best]):
+            best = c
+    if best is None:
+        raise InvalidCutoff(classrooms)
+
+    cut_list = []
+    c = best
+    for parent in reversed(parents):
+        cut_list.append(c)
+        c = parent[c]
+    cut_list.reverse()
+    start_list = ["a"] + [cutoff_list[c] for c in cut_list]
+    score = sum([len(s) ** 2 for s in start_list])
+    return score, start_list
+
+
+################################################################
+
+
+def _exact_chunk(
+    chunk_index,
+    classrooms,
+    index,
+    first,
+    tries,
+    target_score,
+    seed,
+    min_ratio,
+    max_ratio,
+    bound,
+):
+    """
+    Run a chunk of exact solves (see ``order_chunks()``); orders with no
+    split scoring at most ``bound`` (if given) are failures.
+    """
+    n = index.n
+    cut_points = _cut_points(index)
+
+    ntries = 0
+    success_count = 0
+    cb_score, cb_start_list, cb_shuffle = None, None, None
+    for order in chunk_orders(chunk_index, classrooms, first, tries, seed):
+        if parallel.stop_requested(chunk_index):
+            break
         ntries += 1
+        bounds = room_occupancy_bounds(order, min_ratio, max_ratio)
+        if any([low > high for low, high in bounds]):
+            continue
+        if not (sum([b[0] for b in bounds]) <= n <= sum([b[1] for b in bounds])):
+            continue
+        try:
+            score, start_list = _exact_single_order(order, bounds, cut_points, n, bound)
+        except InvalidCutoff:
+            continue
+        success_count += 1
+        parallel.record_score(chunk_index, score, target_score)
+        if cb_score is None or (score < cb_score):
+            cb_score = score
+            cb_start_list = start_list
+            cb_shuffle = [c.pk for c in order]
+        if score <= target_score:
+            break  # we are done
 
-    return cb_score, cb_start_list, cb_shuffle
+    return cb_score, cb_start_list, cb_shuffle, ntries, success_count
 
 
 ################################################################
 
 
-def do_room_splits(
-    exam, commit=True, check_only=False, max_tries=1000, min_ratio=0.3, max_ratio=0.5
+@register_strategy("exact", "Exact (dynamic programming)", admin=True)
+def _exact_strategy(problem):
+    """
+    Find the optimal room splits for each order of classrooms tried,
+    keeping the best.  Each attempt is exact, so unlike the bisection
+    method every order which has a valid split will find it.
+
+    When there are few enough rooms every distinct sequence of capacities
+    is tried; otherwise random orders are.
+    """
+    chunk_args = [
+        (
+            problem.rooms,
+            problem.index,
+            first,
+            tries,
+            problem.best_score,
+            chunk_seed,
+            problem.min_ratio,
+            problem.max_ratio,
+            problem.bound,
+        )
+        for first, tries, chunk_seed in order_chunks(
+            problem.rooms, problem.max_tries, problem.seed
+        )
+    ]
+    return parallel.run_chunks(
+        _exact_chunk,
+        chunk_args,
+        problem.best_score,
+        workers=problem.workers,
+        max_seconds=problem.max_seconds,
+        bound=problem.bound,
+    )
+
+
+################################################################
+
+
+def _permutations_chunk(chunk_index, classrooms, first, ratio, index, cutoff_score):
+    """
+    Branch and bound search of the permutations of classrooms which
+    start with the ``first`` classroom.
+
+    Orders are built up one room at a time, in the same order as
+    ``itertools.permutations()``; rooms with the same capacity are
+    interchangeable, so only one of them is tried at each position.
+    A prefix is abandoned when:
+        * its score, plus the lowest score available to each remaining
+          room, cannot beat the best score found so far; or
+        * the remaining rooms cannot seat the remaining students.
+    The score of a prefix never changes once more rooms are added,
+    so no order which could improve on the best score is skipped.
+    """
+    n = index.n
+    occupancy = [room_occupancy(r, ratio) for r in classrooms]
+    capacity = [r.capacity for r in classrooms]
+    slice_starts = {}  # slice start -> (start letter, score, first index)
+    for j in range(1, n):
+        try:
+            start, k = index.slice_start(j, classrooms)
+        except InvalidCutoff:
+            slice_starts[j] = None
+        else:
+            slice_starts[j] = start, len(start) ** 2, k
+    # the lowest score of any room starting at or after j:
+    min_start_score = [None] * (n + 1)
+    min_start_score[n] = float("inf")
+    for j in range(n - 1, 0, -1):
+        min_start_score[j] = min_start_score[j + 1]
+        if slice_starts[j] is not None:
+            min_start_score[j] = min(min_start_score[j], slice_starts[j][1])
+
+    state = {
+        "best_score": None,
+        "start_list": None,
+        "classrooms": None,
+        "attempts": 0,
+        "successes": 0,
+    }
+
+    def _pruned(score, j, rooms_left):
+        bound = score + rooms_left * min_start_score[j]
+        best_score = state["best_score"]
+        if best_score is not None and bound >= best_score:
+            return True
+        # ties with other chunks are kept, to stay consistent with
+        # a serial search.
+        shared_best = parallel.current_best()
+        if shared_best is not None and bound > shared_best:
+            return True
+        return False
+
+    def _search(order, remaining, j, seated, score, start_list):
+        """
+        ``j`` is where the next room's slice begins;
+        ``seated`` is the number of students placed in earlier rooms.
+        RECURSIVE.
+        """
+        if parallel.stop_requested(chunk_index):
+            return True
+        if not remaining:
+            state["attempts"] += 1
+            state["successes"] += 1
+            parallel.record_score(chunk_index, score, cutoff_score)
+            if state["best_score"] is None or score < state["best_score"]:
+                state["best_score"] = score
+                state["start_list"] = start_list[:]
+                state["classrooms"] = [classrooms[i].pk for i in order]
+            return score <= cutoff_score
+        if j >= n:
+            return False  # no one left for the remaining rooms
+        if _pruned(score, j, len(remaining)):
+            return False
+        if slice_starts[j] is None:
+            state["attempts"] += 1
+            return False
+        # the start of the next room is the same, whichever room it is.
+        start, start_score, k = slice_starts[j]
+        if k - seated > capacity[order[-1]]:
+            return False  # the previous room holds everyone up to k.
+        if n - k > sum([capacity[r] for r in remaining]):
+            return False
+        seen = set()
+        for pos, i in enumerate(remaining):
+            if capacity[i] in seen:
+                continue
+            seen.add(capacity[i])
+            rest = remaining[:pos] + remaining[pos + 1 :]
+            done = _search(
+                order + [i],
+                rest,
+                j + occupancy[i],
+                k,
+                score + start_score,
+                start_list + [start],
+            )
+            if done:
+                return True
+        return False
+
+    remaining = [i for i in range(len(classrooms)) if i != first]
+    try:
+        if n <= sum(capacity):
+            _search([first], remaining, occupancy[first], 0, 1, ["a"])
+    except KeyboardInterrupt:
+        parallel.request_stop()
+
+    return (
+        state["best_score"],
+        state["start_list"],
+        state["classrooms"],
+        state["attempts"],
+        state["successes"],
+    )
+
+
+################################################################
+
+
+@register_strategy("permutations", "Permutations (branch and bound)")
+def _permutations_strategy(problem):
+    """
+    Test all permutations of classrooms for the best score, by branch
+    and bound; each capacity of first classroom is a separate chunk.
+    Nothing is tried with more than ``PERMUTATIONS_MAX_ROOMS`` rooms.
+    """
+    if len(problem.rooms) > PERMUTATIONS_MAX_ROOMS:
+        return None, None, None, 0, 0
+    chunk_args = [
+        (problem.rooms, first, problem.seat_ratio, problem.index, problem.best_score)
+        for first in distinct_firsts(problem.rooms)
+    ]
+    return parallel.run_chunks(
+        _permutations_chunk,
+        chunk_args,
+        problem.best_score,
+        workers=problem.workers,
+        max_seconds=problem.max_seconds,
+        bound=problem.bound,
+    )
+
+
+################################################################
+
+
+def split_rooms(
+    strategy,
+    classrooms,
+    surnames,
+    max_tries=1000,
+    best_score=None,
+    min_ratio=0.0,
+    max_ratio=0.5,
+    workers=1,
+    seed=None,
+    max_seconds=None,
+    bound=None,
 ):
     """
-    Worker entry point for this module; does room splits.
+    Split the people with these (lower case) ``surnames`` between the
+    ``classrooms`` with a registered ``strategy`` (see ``STRATEGIES``).
 
-    This is computationally intesive (~5 seconds) and forms calling this
-    as part of the request response cycle should take this into consideration.
+    The search stops at a split with ``best_score`` (by default, the
+    lowest possible score), after ``max_tries`` orders of rooms, or after
+    ``max_seconds``, whichever comes first.  With ``workers`` > 1 the
+    search is spread over a process pool; for a given ``seed`` the result
+    is the same either way.  A ``bound`` is a score to beat (or tie), e.g.
+    of a split found earlier; the exact and permutations searches skip
+    what cannot.  Returns a ``SplitResult``.
     """
-    classrooms = get_exam_classrooms(exam)
-    ratio = sanity_checks(
-        exam, classrooms, min_cap_ratio=min_ratio, max_cap_ratio=max_ratio
+    if strategy not in STRATEGIES:
+        raise ValueError("Unknown room split strategy: {!r}".format(strategy))
+    started = time()
+    rooms = [SplitRoom(c.pk, c.capacity) for c in classrooms]
+    surnames = sorted(surnames)
+    if sum([r.capacity for r in rooms]) < len(surnames):
+        # there is no seating everyone, whichever strategy is used.
+        return SplitResult(strategy, None, None, None, 0, 0, time() - started)
+    problem = SplitProblem(
+        rooms=rooms,
+        surnames=surnames,
+        index=CutoffIndex(surnames),
+        seat_ratio=sum([r.capacity for r in rooms]) / max(len(surnames), 1),
+        max_tries=max_tries,
+        best_score=len(rooms) if best_score is None else best_score,
+        min_ratio=min_ratio,
+        max_ratio=max_ratio,
+        workers=workers,
+        seed=seed,
+        max_seconds=max_seconds,
+        bound=bound,
     )
+    score, start_list, pk_list, tries, successes = STRATEGIES[strategy].func(problem)
+    return SplitResult(
+        strategy, score, start_list, pk_list, tries, successes, time() - started
+    )
+
+
+################################################################
+
+
+def _room_subset(rooms, history, count, total):
+    """
+    Recover ``count`` rooms with ``total`` seats, from the seat totals
+    reachable with the rooms before each one (see ``room_subsets()``).
+    """
+    subset = []
+    for i in range(len(rooms) - 1, -1, -1):
+        if count == 0:
+            break
+        if not (history[i][count] >> total) & 1:
+            # the earlier rooms can't do it without this one.
+            subset.append(rooms[i])
+            count -= 1
+            total -= rooms[i].capacity
+    subset.reverse()
+    return subset
+
+
+################################################################
+
+
+def room_subsets(classrooms, students, min_ratio=0.0, max_ratio=0.5):
+    """
+    Generate the subsets of the classrooms whose capacity gives an
+    occupancy ratio for ``students`` between ``min_ratio`` and
+    ``max_ratio`` (as ``sanity_checks()``); fewest rooms first, then
+    fewest seats.  There is one subset for each number of rooms and seats.
+
+    This is a subset sum (knapsack) over the seat totals: a bitmask of
+    the totals reachable with each number of rooms is built up one room
+    at a time, so pools of 50 rooms take milliseconds.
+    """
+    rooms = [c for c in classrooms if c.capacity]
+    seats = sum([c.capacity for c in rooms])
+    low = int(ceil(students / max_ratio))
+    high = int(students / min_ratio) if min_ratio > 0 else seats
+    # agree with the ratios sanity_checks() works out, despite rounding.
+    while low > 1 and students / (low - 1) <= max_ratio:
+        low -= 1
+    while students / max(low, 1) > max_ratio:
+        low += 1
+    while min_ratio > 0 and students / (high + 1) >= min_ratio:
+        high += 1
+    while min_ratio > 0 and high > 0 and students / high < min_ratio:
+        high -= 1
+    high = min(high, seats)
+    if low > high:
+        return
+    mask = (1 << (high + 1)) - 1
+    # reach[k] has bit s set when k of the rooms so far have s seats.
+    reach = [1] + [0] * len(rooms)
+    history = []
+    for i, room in enumerate(rooms):
+        history.append(list(reach))
+        for k in range(i + 1, 0, -1):
+            reach[k] |= (reach[k - 1] << room.capacity) & mask
+    for count in range(1, len(rooms) + 1):
+        totals = reach[count] >> low
+        while totals:
+            total = low + (totals & -totals).bit_length() - 1
+            yield _room_subset(rooms, history, count, total)
+            totals &= totals - 1
+
+
+################################################################
+
+
+def split_room_pool(
+    strategy,
+    classrooms,
+    surnames,
+    min_ratio=0.0,
+    max_ratio=0.5,
+    max_subsets=ROOM_POOL_SUBSETS,
+    **kwargs
+):
+    """
+    Choose rooms from a pool of ``classrooms`` (see ``room_subsets()``)
+    and split the surnames between them with ``split_rooms()``.
+    Up to ``max_subsets`` subsets are tried, until one of them can be
+    split.  Returns a ``SplitResult``, with the tries and time for
+    every subset.
+    """
+    started = time()
+    tries, successes = 0, 0
+    result = None
+    for subset in room_subsets(classrooms, len(surnames), min_ratio, max_ratio):
+        result = split_rooms(
+            strategy,
+            subset,
+            surnames,
+            min_ratio=min_ratio,
+            max_ratio=max_ratio,
+            **kwargs
+        )
+        tries += result.tries
+        successes += result.successes
+        max_subsets -= 1
+        if result.score is not None or max_subsets <= 0:
+            break
+    if result is None:
+        return SplitResult(strategy, None, None, None, 0, 0, time() - started)
+    return result._replace(tries=tries, successes=successes, seconds=time() - started)
+
+
+################################################################
+
+
+def room_pool_checks(exam, classrooms, min_cap_ratio, max_cap_ratio):
+    """
+    ``sanity_checks()`` for a pool of rooms to choose from.
+    """
+    reg_count = exam.registration_count
+    if reg_count == 0:
+        raise ValidationError("There are no students registered for this exam")
+    for subset in room_subsets(classrooms, reg_count, min_cap_ratio, max_cap_ratio):
+        return
+    raise ValidationError(
+        "No set of rooms from the pool has an occupancy ratio between {:.2f} and {:.2f}".format(
+            min_cap_ratio, max_cap_ratio
+        )
+    )
+
+
+################################################################
+
+
+def _incremental_candidates(index, cut, letter, window):
+    """
+    The places a cut currently at position ``cut`` (with start letter
+    ``letter``) could move to, within ``window`` students.
+    Returns a list of (position, start letter), in order.
+    """
+    lo = bisect_left(index.offsets, cut - window)
+    hi = bisect_right(index.offsets, cut + window)
+    result = []
+    for i in range(max(lo, 1), min(hi, len(index.names))):
+        position = index.offsets[i]
+        if position == cut:
+            result.append((cut, letter))  # the cut does not move.
+            continue
+        cutoff = index.cutoff_list[i]
+        if cutoff is not None and cutoff.isalpha():
+            result.append((position, cutoff))
+    return result
+
+
+################################################################
+
+
+def _incremental_cuts(index, bounds, cut_list, letter_list, window):
+    """
+    Dynamic programming over the cuts near the current ones (see
+    ``_exact_single_order()``), minimizing the number of students moved
+    across each cut, then the score.
+    returns (moved, score), start_list; or None if there is no split.
+    """
+    n = index.n
+    inf = (float("inf"), float("inf"))
+    layer = [(0, "a")]
+    cost = [(0, 1)]
+    parents = []
+    for i in range(1, len(bounds)):
+        low, high = bounds[i - 1]
+        candidates = _incremental_candidates(index, cut_list[i], letter_list[i], window)
+        next_cost = []
+        parent = []
+        window_min = deque()
+        p = 0
+        for position, letter in candidates:
+            # slide the window of previous cuts [position - high, position - low]
+            while p < len(layer) and layer[p][0] <= position - low:
+                if cost[p] < inf:
+                    while window_min and cost[window_min[-1]] >= cost[p]:
+                        window_min.pop()
+                    window_min.append(p)
+                p += 1
+            while window_min and layer[window_min[0]][0] < position - high:
+                window_min.popleft()
+            if not window_min:
+                next_cost.append(inf)
+                parent.append(None)
+                continue
+            moved, score = cost[window_min[0]]
+            next_cost.append(
+                (moved + abs(position - cut_list[i]), score + len(letter) ** 2)
+            )
+            parent.append(window_min[0])
+        layer, cost = candidates, next_cost
+        parents.append((layer, parent))
+
+    low, high = bounds[-1]
+    best = None
+    for p, (position, letter) in enumerate(layer):
+        if low <= n - position <= high and cost[p] < inf:
+            if best is None or cost[p] < cost[best]:
+                best = p
+    if best is None:
+        return None
+
+    start_list = []
+    p = best
+    for layer, parent in reversed(parents):
+        start_list.append(layer[p][1])
+        p = parent[p]
+    start_list.append("a")
+    start_list.reverse()
+    return cost[best], start_list
+
+
+################################################################
+
+
+def incremental_split(classrooms, surnames, start_list, min_ratio=0.0, max_ratio=0.5):
+    """
+    Split the people with these (lower case) ``surnames`` between the
+    ``classrooms``, in order, starting from their current ``start_list``.
+    Only the cuts which have to move are moved, and as little as they
+    can be: cuts are looked for near the current ones first, and further
+    away only if that fails.
+
+    Returns a ``SplitResult`` (each widening of the search is a try) and
+    the number of students who change rooms.
+    """
+    started = time()
+    rooms = [SplitRoom(c.pk, c.capacity) for c in classrooms]
+    index = CutoffIndex(sorted(surnames))
+    bounds = room_occupancy_bounds(rooms, min_ratio, max_ratio)
+    letter_list = [s.lower() for s in start_list]
+    cut_list = [0] + [
+        index.offsets[bisect_left(index.names, s)] for s in letter_list[1:]
+    ]
+
+    window = INCREMENTAL_WINDOW
+    tries = 0
+    found = None
+    while found is None:
+        tries += 1
+        found = _incremental_cuts(index, bounds, cut_list, letter_list, window)
+        if window >= index.n:
+            break
+        window *= 2
+    if found is None:
+        result = SplitResult(
+            "incremental", None, None, None, tries, 0, time() - started
+        )
+        return result, 0
+
+    (distance, score), new_start_list = found
+    new_cut_list = [0] + [
+        index.offsets[bisect_left(index.names, s)] for s in new_start_list[1:]
+    ]
+    # the students whose room changes:
+    moved = len(
+        [
+            j
+            for j in range(index.n)
+            if bisect_right(cut_list, j) != bisect_right(new_cut_list, j)
+        ]
+    )
+    result = SplitResult(
+        "incremental",
+        score,
+        new_start_list,
+        [r.pk for r in rooms],
+        tries,
+        1,
+        time() - started,
+    )
+    return result, moved
+
+
+################################################################
+
+
+def do_incremental_room_splits(
+    exam, commit=True, check_only=False, min_ratio=0.3, max_ratio=0.5, stats=None
+):
+    """
+    Move the current room splits of the exam as little as possible to
+    bring every room back within the occupancy ratios; see
+    ``incremental_split()``.  The start letters of the exam locations are
+    updated in place.  ``stats`` are as for ``do_room_splits()``, with
+    the number of students ``moved``.
+    """
+    locations = list(exam.examlocation_set.active().select_related("location"))
+    classrooms = [loc.location for loc in locations]
+    sanity_checks(exam, classrooms, min_cap_ratio=min_ratio, max_cap_ratio=max_ratio)
+    if not all([loc.start_letter.isalpha() for loc in locations[1:]]):
+        raise ValidationError(
+            "Every room but the first needs a start letter for an incremental split"
+        )
     if check_only:
         return None
     surnames = [
         n.lower()
         for n in exam.registration_list.values_list("student__person__sn", flat=True)
     ]
-    best_score = len(classrooms)  # used to be a parameter with older methods
-    score, start_list, classrooms = bisection_partition_main(
+    start_list = [loc.start_letter for loc in locations]
+    result, moved = incremental_split(
+        classrooms, surnames, start_list, min_ratio=min_ratio, max_ratio=max_ratio
+    )
+    if stats is not None:
+        stats.update(
+            tries=result.tries,
+            successes=result.successes,
+            seconds=result.seconds,
+            cached=False,
+            moved=moved,
+        )
+    if result.score is None:
+        raise ValidationError("Could not find any valid splits.")
+    if commit:
+        for loc, start_letter in zip(locations, result.start_list):
+            if loc.start_letter != start_letter:
+                loc.start_letter = start_letter
+                loc.save()
+    return result.score
+
+
+################################################################
+
+
+def do_room_splits(
+    exam,
+    commit=True,
+    check_only=False,
+    max_tries=1000,
+    min_ratio=0.3,
+    max_ratio=0.5,
+    strategy="bisection",
+    workers=1,
+    max_seconds=None,
+    stats=None,
+    recompute=False,
+    classroom_pool=None,
+):
+    """
+    Worker entry point for this module; does room splits.
+
+    The search is done by ``split_rooms()``, with a registered
+    ``strategy``, ``workers`` processes and ``max_seconds`` time limit.
+    If ``stats`` is a dictionary, the number of tries, successes and the
+    search time are set in it.
+
+    The best split found for the same students, rooms and options is
+    cached (see ``room_splits_cache_key()``) and used again right away;
+    with ``recompute``, the search is done anyway, with the cached score
+    as the bound to beat (see ``split_rooms()``), and the cached split
+    is only replaced by a better one.  ``stats["cached"]`` is set when
+    the cached split is used.
+
+    With a ``classroom_pool``, the rooms are chosen from the pool (see
+    ``split_room_pool()``) and replace the current exam locations.
+
+    With the "incremental" strategy, the current splits are adjusted
+    instead; see ``do_incremental_room_splits()``.
+
+    This is computationally intesive (~5 seconds for bisection) and forms
+    calling this as part of the request response cycle should take this
+    into consideration.
+    """
+    if strategy == INCREMENTAL_CHOICE[0]:
+        return do_incremental_room_splits(
+            exam,
+            commit=commit,
+            check_only=check_only,
+            min_ratio=min_ratio,
+            max_ratio=max_ratio,
+            stats=stats,
+        )
+    if strategy not in STRATEGIES:
+        raise ValueError("Unknown room split strategy: {!r}".format(strategy))
+    if classroom_pool is not None:
+        classrooms = list(classroom_pool)
+        room_pool_checks(
+            exam, classrooms, min_cap_ratio=min_ratio, max_cap_ratio=max_ratio
+        )
+        search = split_room_pool
+    else:
+        classrooms = get_exam_classrooms(exam)
+        sanity_checks(
+            exam, classrooms, min_cap_ratio=min_ratio, max_cap_ratio=max_ratio
+        )
+        search = split_rooms
+    if check_only:
+        return None
+    surnames = sorted(
+        n.lower()
+        for n in exam.registration_list.values_list("student__person__sn", flat=True)
+    )
+    timeout = conf.get("room_splits:cache_timeout")
+    cache_key = room_splits_cache_key(
+        surnames,
+        classrooms,
+        min_ratio,
+        max_ratio,
+        strategy if classroom_pool is None else "pool:" + strategy,
+    )
+    cached = cache.get(cache_key) if timeout else None
+    if stats is not None:
+        stats["cached"] = False
+    # the lowest possible score (one letter for each room) cannot be beaten.
+    optimal = (
+        cached is not None and classroom_pool is None and cached[0] <= len(classrooms)
+    )
+    if cached is not None and (optimal or not recompute):
+        score, start_list, classrooms = cached
+        if stats is not None:
+            stats.update(tries=0, successes=0, seconds=0, cached=True)
+        return _save_room_splits(exam, commit, score, start_list, classrooms)
+
+    result = search(
+        strategy,
         classrooms,
-        ratio,
         surnames,
         max_tries=max_tries,
-        best_score=best_score,
+        min_ratio=min_ratio,
         max_ratio=max_ratio,
+        workers=workers,
+        max_seconds=max_seconds,
+        bound=cached[0] if cached is not None else None,
     )
+    if stats is not None:
+        stats.update(
+            tries=result.tries, successes=result.successes, seconds=result.seconds
+        )
+    score, start_list, classrooms = result.score, result.start_list, result.classrooms
+    if cached is not None and (score is None or cached[0] <= score):
+        # the earlier split is still the best one.
+        score, start_list, classrooms = cached
+        if stats is not None:
+            stats["cached"] = True
     if score is None:
         raise ValidationError("Could not find any valid splits.")
+    if timeout:
+        cache.set(cache_key, (score, start_list, classrooms), timeout)
+    return _save_room_splits(exam, commit, score, start_list, classrooms)
+
+
+################################################################
+
+
+def _save_room_splits(exam, commit, score, start_list, classrooms):
+    """
+    Replace the exam locations with the given split.
+    ``classrooms`` is a list of primary keys.
+    """
+    from places.models import ClassRoom
+
+    from ..models import ExamLocation
 
     classrooms = [ClassRoom.objects.get(pk=pk) for pk in classrooms]
     if commit:
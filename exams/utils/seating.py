@@ -0,0 +1,243 @@
+"""
+The "where do I write?" index: for each student, their upcoming exams
+and the room they write each one in.
+
+The index covers the public exams in the next ``seating:days`` days.
+It is built in bulk (a few queries for every exam at once, see
+``build_seating_index()``), in the background, and cached one entry per
+student, so a lookup is a single cache ``get_many()``.
+
+The index is stamped with the seating version and the date.  Changes to
+exams, their sections or locations, and to student registrations, bump
+the version (see ``seating_changed()``); until the index is built again,
+lookups go to the database for just the one student, and never see a
+stale room.
+With ``seating:cache_timeout`` set to 0, there is no index at all.
+"""
+from __future__ import print_function, unicode_literals
+
+import datetime
+import re
+from bisect import bisect_right
+
+from django.core.cache import cache
+from django.core.exceptions import ValidationError
+from django.utils.timezone import now
+
+from .. import conf
+from .exam_cache import bump_cache_version, cache_version
+
+################################################################
+
+SEATING_VERSION_KEY = "exams.seating:version"
+
+# Which index is complete: "<version>:<date>".
+CURRENT_KEY = "exams.seating:current"
+
+# Held while the index is built, so it is only built once at a time.
+BUILDING_KEY = "exams.seating:building"
+BUILDING_TIMEOUT = 600
+
+# Students are looked up by one of these.
+LOOKUP_FIELDS = ["number", "login"]
+
+################################################################
+
+
+def _student_key(field, student):
+    return "exams.seating:%s:%s" % (field, student)
+
+
+def _current_build():
+    return "%d:%s" % (cache_version(SEATING_VERSION_KEY), now().date().isoformat())
+
+
+################################################################
+
+
+def clean_student(student):
+    """
+    The student number or login, stripped; a ``ValidationError`` unless
+    it matches the ``seating:student_pattern`` setting.
+    """
+    student = (student or "").strip()
+    if not re.match(conf.get("seating:student_pattern"), student):
+        raise ValidationError("Not a student number or login: %r" % (student,))
+    return student
+
+
+################################################################
+
+
+def seating_changed():
+    """
+    Something which the seating index depends on has changed; the index
+    is out of date, and is built again the next time it is used.
+    """
+    if conf.get("seating:cache_timeout"):
+        bump_cache_version(SEATING_VERSION_KEY)
+
+
+################################################################
+
+
+def _location_finder(locations):
+    """
+    A function from a lower case surname to the location it writes in
+    (or None), for the active locations of one exam, in order.
+    """
+    from ..models import build_location_boundaries, location_intervals
+
+    boundaries = build_location_boundaries(
+        [(loc.pk, loc.start_letter) for loc in locations]
+    )
+    by_pk = dict((loc.pk, loc) for loc in locations)
+    intervals = [i for i in location_intervals(boundaries) if i[1]]
+    starts = [start for pk, start, finish in intervals]
+
+    def find(surname):
+        i = bisect_right(starts, surname) - 1
+        if i < 0:
+            return None
+        pk, start, finish = intervals[i]
+        if surname < finish:
+            return by_pk[pk]
+        return None
+
+    return find
+
+
+################################################################
+
+
+def build_seating_index(dt=None, days=None, field=None, student=None):
+    """
+    Return a dictionary of (field, student) -> list of upcoming exams,
+    each a dictionary suitable for JSON.  Students are keyed by their
+    "number", and also by their "login" (the ``seating:login_field``),
+    if it is set.  With ``field`` and ``student``, only that student is
+    looked up.  Takes three queries.
+    """
+    from students.models import Student_Registration
+
+    from ..models import Exam, ExamLocation
+
+    if dt is None:
+        dt = now()
+    if days is None:
+        days = conf.get("seating:days")
+    login_field = conf.get("seating:login_field")
+    exam_qs = Exam.objects.public().filter(
+        dtstart__gte=dt, dtstart__lt=dt + datetime.timedelta(days=days)
+    )
+
+    fields = ["section__exam", "student__student_number", "student__person__sn"]
+    if login_field:
+        fields.append(login_field)
+    registrations = Student_Registration.objects.reg_list(
+        section__exam__in=exam_qs, good_standing=True, aurora_verified=True
+    )
+    if field == "number":
+        registrations = registrations.filter(student__student_number=student)
+    elif field == "login":
+        if not login_field:
+            return {}
+        registrations = registrations.filter(**{login_field: student})
+    rows = list(registrations.values_list(*fields))
+
+    exams = Exam.objects.in_bulk(list(set([row[0] for row in rows])))
+    locations = {}
+    for loc in (
+        ExamLocation.objects.active()
+        .filter(exam__in=list(exams))
+        .select_related("location")
+    ):
+        locations.setdefault(loc.exam_id, []).append(loc)
+    finders = dict((pk, _location_finder(locations.get(pk, []))) for pk in exams)
+
+    result = {}
+    seen = set()
+    for row in rows:
+        exam_pk, number, surname = row[:3]
+        if (exam_pk, number) in seen:
+            continue  # registered in more than one of the exam's sections.
+        seen.add((exam_pk, number))
+        exam = exams[exam_pk]
+        location = finders[exam_pk](surname.lower())
+        entry = {
+            "exam": exam.slug,
+            "course": exam.course,
+            "name": exam.verbose_name,
+            "url": exam.get_absolute_url(),
+            "dtstart": exam.dtstart.isoformat(),
+            "duration": exam.duration,
+            "location": "{}".format(location.location) if location else None,
+        }
+        for key_field, key in zip(LOOKUP_FIELDS, row[1:2] + row[3:]):
+            if key:
+                result.setdefault((key_field, "{}".format(key)), []).append(entry)
+    for entries in result.values():
+        entries.sort(key=lambda entry: entry["dtstart"])
+    return result
+
+
+################################################################
+
+
+def refresh_seating_index():
+    """
+    Build and cache the index, unless it is being built already.
+    Every student's entry replaces the last one, so old entries do not
+    pile up.  Returns whether the index was built.
+    """
+    timeout = conf.get("seating:cache_timeout")
+    if not timeout or not cache.add(BUILDING_KEY, True, BUILDING_TIMEOUT):
+        return False
+    try:
+        # a change while this runs leaves the index out of date.
+        build = _current_build()
+        index = build_seating_index()
+        cache.set_many(
+            dict(
+                (_student_key(field, student), (build, entries))
+                for (field, student), entries in index.items()
+            ),
+            timeout,
+        )
+        cache.set(CURRENT_KEY, build, timeout)
+    finally:
+        cache.delete(BUILDING_KEY)
+    return True
+
+
+################################################################
+
+
+def lookup_seating(student, field="number"):
+    """
+    The upcoming exams (and rooms) for a student, by "number" or
+    "login"; see ``build_seating_index()``.  From the index when it is
+    up to date, otherwise from the database (and the index is built
+    again in the background).
+    """
+    from .background import run_in_background
+
+    student = clean_student(student)
+    if not conf.get("seating:cache_timeout"):
+        return build_seating_index(field=field, student=student).get(
+            (field, student), []
+        )
+    student_key = _student_key(field, student)
+    build = _current_build()
+    values = cache.get_many([CURRENT_KEY, BUILDING_KEY, student_key])
+    if values.get(CURRENT_KEY) == build:
+        value = values.get(student_key)
+        if value is not None and value[0] == build:
+            return value[1]
+    elif BUILDING_KEY not in values:
+        run_in_background(refresh_seating_index)
+    # not in the index: no exams, or evicted from the cache.
+    return build_seating_index(field=field, student=student).get((field, student), [])
+
+
+################################################################
@@ -0,0 +1,100 @@
+"""
+Optional NumPy versions of the room split calculations.
+
+NumPy is not required (``pip install django-dept-exams[numpy]``);
+``AVAILABLE`` says whether it is installed, and the searches fall back
+to plain Python when it is not.
+
+Only the shuffle search is covered.  The sequential split of an order
+of rooms (one room after another, see ``room_splits.sequential_split()``)
+only depends on where each room starts, so a whole batch of random
+orders can be scored at once.
+
+The bisection and exact searches (``_best_split()`` and the windows of
+cuts they score) are left in plain Python: each cut depends on the ones
+before it, and on which branch of the search it is in, so there is no
+batch of independent cuts to hand to NumPy; and each is already a
+logarithmic lookup in the ``CutoffIndex``, cheaper than the overhead of
+one NumPy call.
+"""
+from __future__ import print_function, unicode_literals
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+################################################################
+
+AVAILABLE = numpy is not None
+
+################################################################
+
+
+def cutoff_arrays(index):
+    """
+    The ``CutoffIndex`` as arrays: offsets, next_cut (-1 where there
+    is none) and the score of each cut.  These are built once and kept
+    on the index.
+    """
+    arrays = getattr(index, "_arrays", None)
+    if arrays is None:
+        offsets = numpy.array(index.offsets, dtype=numpy.int64)
+        next_cut = numpy.array(
+            [-1 if i is None else i for i in index.next_cut], dtype=numpy.int64
+        )
+        # the length of each cutoff; one more than the common prefix.
+        lengths = numpy.array(
+            [0 if c is None else len(c) for c in index.cutoff_list], dtype=numpy.int64
+        )
+        arrays = offsets, next_cut, lengths ** 2
+        index._arrays = arrays
+    return arrays
+
+
+################################################################
+
+
+def sequential_scores(index, occupancy, orders, same_limit=5):
+    """
+    Score the sequential split of many orders of rooms at once.
+    ``occupancy`` is the number of students for each room, and ``orders``
+    is a (tries x rooms) array of indexes into it.
+    Returns an array of scores, with -1 where there is no valid split.
+    """
+    offsets, next_cut, scores = cutoff_arrays(index)
+    n = index.n
+    occupancy = numpy.asarray(occupancy, dtype=numpy.int64)[orders]
+    # where the second and later rooms start:
+    starts = numpy.cumsum(occupancy, axis=1)[:, :-1]
+    valid = starts < n
+    cut = next_cut[numpy.searchsorted(offsets, numpy.minimum(starts, n))]
+    valid &= cut >= 0
+    cut = numpy.maximum(cut, 0)
+    # don't skip too many people with the same surname as the last room.
+    valid &= offsets[cut] - starts <= same_limit
+    total = 1 + scores[cut].sum(axis=1)
+    return numpy.where(valid.all(axis=1), total, -1)
+
+
+################################################################
+
+
+def first_best(scores, target_score):
+    """
+    The outcome of trying each score in turn, until one reaches the
+    ``target_score``: (position of the best, tries, successes).
+    The position is None when there were no successes.
+    """
+    valid = scores >= 0
+    hits = numpy.flatnonzero(valid & (scores <= target_score))
+    tries = int(hits[0]) + 1 if len(hits) else len(scores)
+    valid = valid[:tries]
+    successes = int(valid.sum())
+    if not successes:
+        return None, tries, successes
+    masked = numpy.where(valid, scores[:tries], numpy.iinfo(numpy.int64).max)
+    return int(masked.argmin()), tries, successes
+
+
+################################################################
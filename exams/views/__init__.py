@@ -5,23 +5,26 @@ Views for the exams app.
 
 from classes.models import Course
 from django.contrib.auth.decorators import permission_required
+from django.core.exceptions import ValidationError
+from django.http import JsonResponse
 from django.shortcuts import get_object_or_404
+from django.views.decorators.http import condition
 from django.views.generic.detail import DetailView
 from django.views.generic.edit import FormView
 from django.views.generic.list import ListView
 from latex.djangoviews import LaTeXDetailView, LaTeXResponseMixin
-from webcal.views import generic_queryset_icalendar
 
-from .. import utils
+from .. import conf, utils
 from ..forms import LaTeXFormatForm
 from ..models import Exam, ExamFile
+from ..utils import feeds, seating
 
 ################################################################
 ################################################################
 
 
 class ExamMixin(object):
-    queryset = Exam.objects.public().prefetch_related("sections")
+    queryset = Exam.objects.public().for_listing()
 
 
 ################################################################
@@ -261,13 +264,61 @@ admin_room_poster = permission_required("exams.change_exam")(
 ################################################################
 
 
-def exam_calendar(request):
+def _calendar_state(request, **kwargs):
     """
-    An iCal feed for *public* *future* exams.
+    The ``FeedState`` of the calendar, found once per request.
     """
-    return generic_queryset_icalendar(
-        request, Exam.objects.public().future(), include_set_events=False
+    state = getattr(request, "_exams_calendar_state", None)
+    if state is None:
+        name = "calendar:%r" % (sorted(kwargs.items()),)
+        state = feeds.feed_state(feeds.feed_queryset(**kwargs), name)
+        request._exams_calendar_state = state
+    return state
+
+
+def _calendar_etag(request, *args, **kwargs):
+    return _calendar_state(request, **kwargs).etag
+
+
+def _calendar_last_modified(request, *args, **kwargs):
+    return _calendar_state(request, **kwargs).last_modified
+
+
+@condition(etag_func=_calendar_etag, last_modified_func=_calendar_last_modified)
+def exam_calendar(request, **kwargs):
+    """
+    An iCal feed for *public* *future* exams; of a course, section or
+    term, if given (see ``feeds.feed_queryset()``).
+    """
+    return feeds.calendar_response(
+        feeds.feed_queryset(**kwargs), _calendar_state(request, **kwargs)
     )
 
 
 ################################################################
+
+
+def seating_lookup(request):
+    """
+    Where does a student write?  JSON of their upcoming exams and rooms;
+    see ``exams.utils.seating``.  Students (with the
+    ``seating:login_field`` setting) get their own, by login; those who
+    can change exams can look up anyone, with ``?student=`` (a student
+    number).
+    """
+    if not request.user.is_authenticated:
+        return JsonResponse({"error": "You must be signed in"}, status=403)
+    if request.user.has_perm("exams.change_exam"):
+        field, student = "number", request.GET.get("student", "")
+    elif conf.get("seating:login_field"):
+        field, student = "login", request.user.get_username()
+    else:
+        return JsonResponse({"error": "Permission denied"}, status=403)
+    try:
+        exams = seating.lookup_seating(student, field)
+    except ValidationError as e:
+        return JsonResponse({"error": " ".join(e.messages)}, status=400)
+    return JsonResponse({"student": student.strip(), "exams": exams})
+
+
+################################################################
@@ -4,13 +4,17 @@ Admin only views
 ##########################################################################
 
 from django.contrib import messages
-from django.core.exceptions import ValidationError
+from django.core.exceptions import PermissionDenied, ValidationError
+from django.http import HttpResponseRedirect, JsonResponse
 from django.shortcuts import get_object_or_404
-from django.urls import reverse_lazy
+from django.urls import reverse, reverse_lazy
+from django.views.generic import TemplateView, View
 from django.views.generic.edit import FormView
 
+from .. import conf
 from ..forms import DoRoomSplitForm
-from ..models import Exam
+from ..models import Exam, RoomSplitJob
+from ..utils.background import submit_room_split_job
 
 ##########################################################################
 
@@ -42,8 +46,22 @@ class AdminSiteViewMixin(object):
 ################################################################
 
 
-class AdminFormMixin(object):
+class ChangeExamRequiredMixin(object):
+    """
+    Only for users who can change exams (like the other exam admin
+    views); anyone else gets a 403.
+    """
+
+    def dispatch(self, request, *args, **kwargs):
+        if not request.user.has_perm("exams.change_exam"):
+            raise PermissionDenied
+        return super(ChangeExamRequiredMixin, self).dispatch(request, *args, **kwargs)
+
+
+################################################################
 
+
+class AdminFormMixin(object):
     model = None
     _obj_cache = None
 
@@ -77,7 +95,9 @@ class AdminFormMixin(object):
 ################################################################
 
 
-class DoRoomSplitsFormView(AdminSiteViewMixin, AdminFormMixin, FormView):
+class DoRoomSplitsFormView(
+    ChangeExamRequiredMixin, AdminSiteViewMixin, AdminFormMixin, FormView
+):
     """
     A view to bulk upload files.
     """
@@ -95,12 +115,23 @@ class DoRoomSplitsFormView(AdminSiteViewMixin, AdminFormMixin, FormView):
         initial["min_ratio"] = 0.3
         initial["max_ratio"] = 0.5
         initial["max_tries"] = 1000
+        initial["max_seconds"] = conf.get("room_splits:max_seconds")
+        initial["strategy"] = "exact"
         return initial
 
     def form_valid(self, form):
         """
         Process successful form submission.
         """
+        if conf.get("room_splits:background"):
+            job = form.create_job()
+            submit_room_split_job(job)
+            return HttpResponseRedirect(
+                reverse(
+                    "admin:exams_exam_split_rooms_job",
+                    args=[self.get_original_obj().pk, job.pk],
+                )
+            )
         try:
             form.save(commit=True)
         except ValidationError as e:
@@ -109,7 +140,16 @@ class DoRoomSplitsFormView(AdminSiteViewMixin, AdminFormMixin, FormView):
             messages.error(self.request, error, fail_silently=True)
             return super(DoRoomSplitsFormView, self).form_invalid(form)
         else:
-            messages.success(self.request, "Room split complete", fail_silently=True)
+            message = "Room split complete: {successes} of {tries} tries succeeded in {seconds:.1f} seconds.".format(
+                **form.stats
+            )
+            if form.stats.get("cached"):
+                message += (
+                    " The split found earlier for these students and rooms was used."
+                )
+            if "moved" in form.stats:
+                message += " {moved} students changed rooms.".format(**form.stats)
+            messages.success(self.request, message, fail_silently=True)
             return super(DoRoomSplitsFormView, self).form_valid(form)
 
     def get_success_url(self):
@@ -128,3 +168,90 @@ class DoRoomSplitsFormView(AdminSiteViewMixin, AdminFormMixin, FormView):
 
 
 ################################################################
+
+
+class RoomSplitJobMixin(AdminFormMixin):
+    """
+    Look up the room split job for the exam in the url.
+    """
+
+    model = Exam
+
+    def get_job(self):
+        job = get_object_or_404(
+            RoomSplitJob, pk=self.kwargs.get("job"), exam=self.get_original_obj()
+        )
+        job.fail_if_lost()
+        return job
+
+
+################################################################
+
+
+class RoomSplitJobView(
+    ChangeExamRequiredMixin, AdminSiteViewMixin, RoomSplitJobMixin, TemplateView
+):
+    """
+    Wait for a background room split to finish.
+    The page polls ``RoomSplitJobStatusView`` and reloads itself when
+    the job is finished; the result is then reported as a message.
+    """
+
+    template_name = "admin/exams/exam/split_rooms_job.html"
+
+    def get(self, request, *args, **kwargs):
+        job = self.get_job()
+        if job.status == "done":
+            message = "Room split complete: {successes} of {tries} tries succeeded in {seconds:.1f} seconds.".format(
+                successes=job.successes, tries=job.tries, seconds=job.seconds or 0
+            )
+            if job.message:
+                message += " " + job.message
+            messages.success(request, message, fail_silently=True)
+            return HttpResponseRedirect(self.get_success_url())
+        if job.status == "failed":
+            error = job.message
+            error += " You may be able to adjust the split options and try again."
+            messages.error(request, error, fail_silently=True)
+            return HttpResponseRedirect(
+                reverse(
+                    "admin:exams_exam_split_rooms", args=[self.get_original_obj().pk]
+                )
+            )
+        return super(RoomSplitJobView, self).get(request, *args, **kwargs)
+
+    def get_success_url(self):
+        obj = self.get_original_obj()
+        return reverse_lazy("admin:exams_exam_change", args=[obj.pk])
+
+    def get_context_data(self, **kwargs):
+        """
+        Extend the context so the admin template works properly.
+        """
+        context = super(RoomSplitJobView, self).get_context_data(**kwargs)
+        job = self.get_job()
+        context.update(
+            page_header="Splitting rooms",
+            job=job,
+            poll_seconds=job.lost_after,
+            status_url=reverse(
+                "admin:exams_exam_split_rooms_job_status",
+                args=[self.get_original_obj().pk, job.pk],
+            ),
+        )
+        return context
+
+
+################################################################
+
+
+class RoomSplitJobStatusView(ChangeExamRequiredMixin, RoomSplitJobMixin, View):
+    """
+    The status of a background room split, as JSON.
+    """
+
+    def get(self, request, *args, **kwargs):
+        return JsonResponse(self.get_job().status_dict())
+
+
+################################################################